@@ -3,21 +3,18 @@ import os
 import sys
 import time
 import json
-import numpy as np
-import fitz # PyMuPDF
-import torch
 import gc
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from chunking.structure_aware_chunker import StructureAwareChunker
-from extraction.pdf_extractor import PDFExtractor
 from utils.logging import get_logger
 
+# Heavy dependencies (torch, sentence-transformers, fitz, the extraction
+# stack) are imported inside the functions that need them, so importing
+# this module costs milliseconds instead of multi-second torch startup.
+
 # Force UTF-8
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -41,9 +38,10 @@ class UnstructuredHybridWrapper:
         
     def chunk(self, pdf_path):
         try:
+            import fitz # PyMuPDF
             from unstructured.documents.elements import Text, Title
             from unstructured.chunking.title import chunk_by_title
-            
+
             doc = fitz.open(pdf_path)
             elements = []
             
@@ -89,12 +87,21 @@ def save_cached_chunks(chunks, strategy, size, pdf_name):
 
 def clear_memory():
     """Clear RAM and VRAM."""
+    import torch
+
     gc.collect()
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
     time.sleep(2)
 
 def run_benchmark():
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    from chunking.structure_aware_chunker import StructureAwareChunker
+    from extraction.pdf_extractor import PDFExtractor
+
     pdf_name = "Mathematics-11 1-43-75.pdf"
     pdf_path = os.path.join("data/raw", pdf_name)
     
@@ -129,12 +136,15 @@ def run_benchmark():
     ]
 
     results_file = "benchmark_results.txt"
-    with open(results_file, "w", encoding='utf-8') as f:
-        f.write(f"Benchmark Request: {time.ctime()}\n")
-        f.write(f"Questions Tested:\n")
-        for i, q in enumerate(QUERIES):
-            f.write(f"  {i+1}. {q}\n")
-        f.write("\n")
+    # One handle streamed for the whole run: each result is written (and
+    # flushed, so progress is visible) as it completes, instead of
+    # reopening the file per result
+    report = open(results_file, "w", encoding='utf-8')
+    report.write(f"Benchmark Request: {time.ctime()}\n")
+    report.write(f"Questions Tested:\n")
+    for i, q in enumerate(QUERIES):
+        report.write(f"  {i+1}. {q}\n")
+    report.write("\n")
 
     print(f"Starting Benchmark on {pdf_name}...", flush=True)
     device = 'cpu'
@@ -147,7 +157,7 @@ def run_benchmark():
             chunks_text = get_cached_chunks(strategy, size, pdf_name)
             
             if chunks_text is None:
-                start_time = time.time()
+                start_time = time.perf_counter()
                 if strategy == "StructureAware":
                     extractor = PDFExtractor(pdf_path, "benchmarks/temp")
                     data = extractor.extract_all()
@@ -159,7 +169,7 @@ def run_benchmark():
                     wrapper = UnstructuredHybridWrapper(size)
                     chunks_text = wrapper.chunk(pdf_path)
                 
-                build_time = time.time() - start_time
+                build_time = time.perf_counter() - start_time
                 save_cached_chunks(chunks_text, strategy, size, pdf_name)
                 print(f"Chunking completed in {build_time:.2f}s (Saved to Cache)", flush=True)
             else:
@@ -183,7 +193,7 @@ def run_benchmark():
                     model = SentenceTransformer(model_name, trust_remote_code=True, device=device)
                     
                     # 2. Embed and Evaluate
-                    start_retrieval = time.time()
+                    start_retrieval = time.perf_counter()
                     try:
                         chunk_embeddings = model.encode(chunks_text, normalize_embeddings=True, show_progress_bar=False)
                         query_embeddings = model.encode(QUERIES, normalize_embeddings=True, show_progress_bar=False)
@@ -197,7 +207,7 @@ def run_benchmark():
                             raise e_mem
 
                     similarities = cosine_similarity(query_embeddings, chunk_embeddings)
-                    retrieval_time = time.time() - start_retrieval
+                    retrieval_time = time.perf_counter() - start_retrieval
                     
                     max_sims = np.max(similarities, axis=1)
                     avg_sim = np.mean(max_sims)
@@ -227,9 +237,9 @@ Sample Result: "{sample_result}..."
 ============================================================
 """
                     print(output, flush=True)
-                    with open(results_file, "a", encoding='utf-8') as f:
-                        f.write(output + "\n")
-                        
+                    report.write(output + "\n")
+                    report.flush()
+
                 except Exception as e:
                     print(f"    Error evaluating model {model_name}: {e}", flush=True)
                 finally:
@@ -238,6 +248,7 @@ Sample Result: "{sample_result}..."
                     del model
                     clear_memory()
 
+    report.close()
     print(f"\nBenchmark Complete. Results saved to {results_file}")
 
 if __name__ == "__main__":
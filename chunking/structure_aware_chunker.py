@@ -345,7 +345,7 @@ class StructureAwareChunker:
         # If small enough, create single chunk
         if total_len <= max_chars:
             equations = self.math_detector.extract_equations(text)
-            chunk = ContentChunk(
+            chunk = ContentChunk.new(
                 chunk_id=str(uuid.uuid4()),
                 document_id=document_id,
                 class_level=class_level,
@@ -387,7 +387,7 @@ class StructureAwareChunker:
                 if part_num > 1 and f"{buffer['type']} {buffer['number']}".lower() not in final_text.lower()[:50]:
                     final_text = f"[{buffer['type'].capitalize()} {buffer['number']} (Part {part_num})]\n\n" + final_text
                 
-                chunk = ContentChunk(
+                chunk = ContentChunk.new(
                     chunk_id=str(uuid.uuid4()),
                     document_id=document_id,
                     class_level=class_level,
@@ -424,7 +424,7 @@ class StructureAwareChunker:
             if part_num > 1 and f"{buffer['type']} {buffer['number']}".lower() not in final_text.lower()[:50]:
                 final_text = f"[{buffer['type'].capitalize()} {buffer['number']} (Part {part_num})]\n\n" + final_text
             
-            chunk = ContentChunk(
+            chunk = ContentChunk.new(
                 chunk_id=str(uuid.uuid4()),
                 document_id=document_id,
                 class_level=class_level,
@@ -579,7 +579,7 @@ class StructureAwareChunker:
         # Extract equations
         equations = self.math_detector.extract_equations(text)
         
-        chunk = ContentChunk(
+        chunk = ContentChunk.new(
             chunk_id=str(uuid.uuid4()),
             document_id=document_id,
             class_level=class_level,
@@ -1,5 +1,7 @@
 import fitz  # PyMuPDF
+import functools
 import logging
+import numpy as np
 from utils.logging import get_logger
 from pathlib import Path
 from typing import Dict, Any, List
@@ -13,6 +15,57 @@ from tqdm import tqdm
 logger = get_logger(__name__)
 
 
+@functools.lru_cache(maxsize=4096)
+def _is_formula_heavy(text: str) -> bool:
+    """
+    Detect if a text block is formula-heavy using heuristics.
+
+    Module-level and LRU-cached: running headers, footers and "CHAPTER n"
+    banners repeat identical text across pages, so repeated blocks become
+    a single dict lookup.
+    """
+    if not text:
+        return False
+
+    # Strip once and reuse (each strip() allocates a new string)
+    stripped = text.strip()
+    if len(stripped) < 10:
+        return False
+
+    # Count mathematical symbols
+    math_symbols = ['=', '±', '×', '÷', '∫', '∑', '∏', '√', '∞', '∂', '∇',
+                   '≤', '≥', '≠', '≈', '→', '←', '↔', '⇒', '⇐', '⇔',
+                   'α', 'β', 'γ', 'δ', 'θ', 'λ', 'μ', 'σ', 'π', 'ω', 'Δ']
+
+    math_count = sum(stripped.count(sym) for sym in math_symbols)
+
+    # Count common math functions
+    math_functions = ['sin', 'cos', 'tan', 'log', 'ln', 'exp', 'lim']
+    function_count = sum(len(re.findall(rf'\b{func}\b', stripped, re.IGNORECASE)) for func in math_functions)
+
+    # Fraction-like patterns (numerator over denominator)
+    # Detect multiple short lines which might indicate stacked fractions
+    lines = stripped.split('\n')
+    short_lines = []
+    for line in lines:
+        s = line.strip()  # Strip each line once
+        if 0 < len(s) < 30:
+            short_lines.append(s)
+
+    # Heuristic: Consider formula-heavy if:
+    # 1. High density of math symbols (>3 symbols)
+    # 2. Or multiple math functions (>2)
+    # 3. Or many short lines suggesting stacked layout (>3)
+
+    is_formula = (
+        math_count >= 3 or
+        function_count >= 2 or
+        (len(short_lines) >= 3 and math_count >= 1)
+    )
+
+    return is_formula
+
+
 class PDFExtractor:
     def __init__(self, pdf_path: str, output_dir: str):
         self.pdf_path = pdf_path
@@ -69,26 +122,29 @@ class PDFExtractor:
         """
         # Get blocks with bounding boxes
         blocks_raw = page.get_text("blocks")
-        
-        reconstructed_text_parts = []
+
+        # Single linear buffer instead of list + join (one allocation per page)
+        text_buffer = io.StringIO()
         processed_blocks = []
-        
+
         for block in blocks_raw:
             if block[6] != 0:  # Skip non-text blocks
                 continue
-                
+
             bbox = block[:4]
             block_text = block[4]
-            
+
             # Detect if this block contains dense mathematical formulas
             if self._is_formula_heavy_block(block_text):
                 logger.debug(f"Formula block detected on page {page_number}: {block_text[:50]}...")
-                
+
                 # Try OCR extraction for better formula preservation
                 try:
                     ocr_text = self._extract_formula_with_ocr(page, bbox)
                     if ocr_text and len(ocr_text.strip()) > 0:
-                        reconstructed_text_parts.append(ocr_text)
+                        if processed_blocks:
+                            text_buffer.write('\n')
+                        text_buffer.write(ocr_text)
                         processed_blocks.append({
                             'bbox': bbox,
                             'text': ocr_text,
@@ -96,7 +152,9 @@ class PDFExtractor:
                         })
                     else:
                         # Fallback to regular extraction
-                        reconstructed_text_parts.append(block_text)
+                        if processed_blocks:
+                            text_buffer.write('\n')
+                        text_buffer.write(block_text)
                         processed_blocks.append({
                             'bbox': bbox,
                             'text': block_text,
@@ -104,7 +162,9 @@ class PDFExtractor:
                         })
                 except Exception as e:
                     logger.warning(f"OCR failed for block, using fallback: {e}")
-                    reconstructed_text_parts.append(block_text)
+                    if processed_blocks:
+                        text_buffer.write('\n')
+                    text_buffer.write(block_text)
                     processed_blocks.append({
                         'bbox': bbox,
                         'text': block_text,
@@ -112,16 +172,18 @@ class PDFExtractor:
                     })
             else:
                 # Regular text block - use PyMuPDF extraction
-                reconstructed_text_parts.append(block_text)
+                if processed_blocks:
+                    text_buffer.write('\n')
+                text_buffer.write(block_text)
                 processed_blocks.append({
                     'bbox': bbox,
                     'text': block_text,
                     'type': 'text'
                 })
-        
+
         return {
             'page_number': page_number,
-            'text': '\n'.join(reconstructed_text_parts),
+            'text': text_buffer.getvalue(),
             'blocks': processed_blocks
         }
     
@@ -129,37 +191,7 @@ class PDFExtractor:
         """
         Detect if a text block is formula-heavy using heuristics.
         """
-        if not text or len(text.strip()) < 10:
-            return False
-        
-        # Count mathematical symbols
-        math_symbols = ['=', '±', '×', '÷', '∫', '∑', '∏', '√', '∞', '∂', '∇',
-                       '≤', '≥', '≠', '≈', '→', '←', '↔', '⇒', '⇐', '⇔',
-                       'α', 'β', 'γ', 'δ', 'θ', 'λ', 'μ', 'σ', 'π', 'ω', 'Δ']
-        
-        math_count = sum(text.count(sym) for sym in math_symbols)
-        
-        # Count common math functions
-        math_functions = ['sin', 'cos', 'tan', 'log', 'ln', 'exp', 'lim']
-        function_count = sum(len(re.findall(rf'\b{func}\b', text, re.IGNORECASE)) for func in math_functions)
-        
-        # Fraction-like patterns (numerator over denominator)
-        # Detect multiple short lines which might indicate stacked fractions
-        lines = text.strip().split('\n')
-        short_lines = [l for l in lines if len(l.strip()) < 30 and len(l.strip()) > 0]
-        
-        # Heuristic: Consider formula-heavy if:
-        # 1. High density of math symbols (>3 symbols)
-        # 2. Or multiple math functions (>2)
-        # 3. Or many short lines suggesting stacked layout (>3)
-        
-        is_formula = (
-            math_count >= 3 or 
-            function_count >= 2 or 
-            (len(short_lines) >= 3 and math_count >= 1)
-        )
-        
-        return is_formula
+        return _is_formula_heavy(text)
     
     def _extract_formula_with_ocr(self, page, bbox: tuple) -> str:
         """
@@ -272,32 +304,58 @@ class PDFExtractor:
         # Look up to 300 units above
         search_area = fitz.Rect(col_min_x, max(0, caption_rect.y0 - 300), col_max_x, caption_rect.y0)
         
-        # Filter drawings that stay WITHIN this specific column
-        drawings = []
-        for d in page.get_drawings():
-            d_rect = d["rect"]
-            
-            # Ignore page-sized backgrounds/borders/layout containers
-            # If a single drawing is very large (e.g. > 50% of page height), it's likely a container
-            if d_rect.width > page.rect.width * 0.9 or d_rect.height > page.rect.height * 0.5:
-                continue
-                
-            if (d_rect.intersects(search_area) and 
-                d_rect.x0 >= col_min_x and 
-                d_rect.x1 <= col_max_x):
-                drawings.append(d_rect)
-        
-        if not drawings:
+        # Filter drawings that stay WITHIN this specific column.
+        # Vectorized with NumPy: graphics-heavy pages can have hundreds of
+        # drawings, and this runs once per caption on the page.
+        rects = self._get_drawing_rects(page)
+        if rects.size == 0:
             return None
-            
-        # Merge all drawing rects
-        diagram_box = drawings[0]
-        for d_rect in drawings[1:]:
-            diagram_box |= d_rect
-            
+
+        # Ignore page-sized backgrounds/borders/layout containers
+        # If a single drawing is very large (e.g. > 50% of page height), it's likely a container
+        mask = (
+            (rects[:, 2] - rects[:, 0] <= page.rect.width * 0.9) &
+            (rects[:, 3] - rects[:, 1] <= page.rect.height * 0.5) &
+            # Stays within the column
+            (rects[:, 0] >= col_min_x) &
+            (rects[:, 2] <= col_max_x) &
+            # Overlaps the vertical search area
+            (rects[:, 0] < search_area.x1) &
+            (rects[:, 2] > search_area.x0) &
+            (rects[:, 1] < search_area.y1) &
+            (rects[:, 3] > search_area.y0)
+        )
+
+        if not mask.any():
+            return None
+
+        # Merge all surviving rects in one vectorized min/max pass
+        survivors = rects[mask]
+        diagram_box = fitz.Rect(
+            float(survivors[:, 0].min()),
+            float(survivors[:, 1].min()),
+            float(survivors[:, 2].max()),
+            float(survivors[:, 3].max())
+        )
+
         # Add padding
         return diagram_box + (-5, -5, 5, 5)
 
+    def _get_drawing_rects(self, page) -> np.ndarray:
+        """Get drawing bounding boxes as an (N, 4) float32 array, cached per page."""
+        cached = getattr(self, '_drawing_rects_cache', None)
+        if cached is not None and cached[0] == page.number:
+            return cached[1]
+
+        rects = np.asarray(
+            [(d["rect"].x0, d["rect"].y0, d["rect"].x1, d["rect"].y1)
+             for d in page.get_drawings()],
+            dtype=np.float32
+        ).reshape(-1, 4)
+
+        self._drawing_rects_cache = (page.number, rects)
+        return rects
+
     def _extract_images_and_diagrams(self, page, page_number: int, split_x: float) -> List[Dict[str, Any]]:
         """Extract images and diagrams based on captions."""
         images = []
@@ -395,10 +453,14 @@ class PDFExtractor:
         """
         logger.info(f"Extracting text from {file_path}")
         extraction_result = self.extract_all()
-        
-        text_parts = []
-        for page_data in extraction_result['pages']:
-            text_parts.append(page_data['text'])
-        
-        return '\n\n'.join(text_parts)
+
+        # Stream page texts into one buffer instead of list + join
+        # (avoids holding every page string twice for large books)
+        buf = io.StringIO()
+        for i, page_data in enumerate(extraction_result['pages']):
+            if i > 0:
+                buf.write('\n\n')
+            buf.write(page_data['text'])
+
+        return buf.getvalue()
 
@@ -0,0 +1,109 @@
+"""Micro-batching queue for concurrent LLM requests."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collect concurrent in-flight requests and dispatch them together.
+
+    Requests submitted within a short window are popped as one batch and
+    dispatched in parallel with asyncio.gather, amortizing per-request
+    Python/HTTP overhead and keeping the connection pool saturated at
+    high QPS. Each item carries its own payload, so mixed
+    (model, temperature) variants can share one batcher.
+
+    Usage:
+        batcher = MicroBatcher(lambda payload: client.agenerate(**payload))
+        result = await batcher.submit({'prompt': '...'})
+    """
+
+    def __init__(
+        self,
+        dispatch_func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        max_batch: int = 16,
+        max_wait_ms: float = 20.0
+    ):
+        """
+        Initialize micro-batcher.
+
+        Args:
+            dispatch_func: Async callable executing a single payload
+            max_batch: Maximum requests dispatched per batch
+            max_wait_ms: Maximum time to wait for a batch to fill
+        """
+        self.dispatch_func = dispatch_func
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker_task: Any = None
+
+    async def submit(self, payload: Dict[str, Any]) -> Any:
+        """
+        Submit a payload and await its result.
+
+        Args:
+            payload: Keyword arguments for the dispatch function
+
+        Returns:
+            The dispatch function's result for this payload
+        """
+        self._ensure_worker()
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+
+    def _ensure_worker(self):
+        """Start the background batch worker if not already running."""
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def _worker(self):
+        """Pop batches off the queue and dispatch them in parallel."""
+        while True:
+            batch = [await self._queue.get()]
+
+            # Fill the batch for up to max_wait_ms
+            deadline = asyncio.get_running_loop().time() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._dispatch_batch(batch)
+
+    async def _dispatch_batch(self, batch: List[Any]):
+        """Dispatch all payloads in the batch concurrently and resolve futures."""
+        logger.debug(f"Dispatching micro-batch of {len(batch)} requests")
+
+        results = await asyncio.gather(
+            *[self.dispatch_func(payload) for payload, _ in batch],
+            return_exceptions=True
+        )
+
+        for (_, future), result in zip(batch, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self):
+        """Stop the background worker."""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
@@ -0,0 +1,104 @@
+"""Exact-match response cache for LLM calls."""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Responses generated above this temperature vary too much to cache safely
+MAX_CACHEABLE_TEMPERATURE = 0.3
+
+
+class LLMResponseCache:
+    """
+    In-process TTL + LRU cache for LLM responses.
+
+    Keys are content hashes of the full request payload, so identical
+    requests (same model, temperature, max_tokens, messages) short-circuit
+    the network round-trip entirely.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 3600.0):
+        """
+        Initialize response cache.
+
+        Args:
+            maxsize: Maximum number of cached responses
+            ttl_seconds: Time-to-live for each entry
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (expiry, response)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> Optional[str]:
+        """
+        Build a deterministic cache key for a completion request.
+
+        Returns None if the request is not safely cacheable
+        (high temperature means non-deterministic output).
+        """
+        if temperature > MAX_CACHEABLE_TEMPERATURE:
+            return None
+
+        payload = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Get cached response for key, or None on miss/expiry."""
+        if key is None:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expiry, response = entry
+        if time.monotonic() > expiry:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        # Refresh LRU position
+        self._entries.move_to_end(key)
+        self.hits += 1
+        logger.debug(f"LLM cache hit ({self.hits} hits / {self.misses} misses)")
+        return response
+
+    def set(self, key: Optional[str], response: Dict[str, Any]):
+        """Store response under key, evicting the oldest entry if full."""
+        if key is None:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -1,14 +1,109 @@
 """Groq LLM client for generation."""
 
+import asyncio
+import functools
+import io
 import os
-from groq import Groq, RateLimitError, APIConnectionError, InternalServerError
-from typing import List, Dict, Any, Optional
+import random
+import time
+from collections import OrderedDict
+import httpx
+from groq import Groq, AsyncGroq, RateLimitError, APIConnectionError, InternalServerError
+from typing import Iterator, List, Dict, Any, Optional
+from llm.cache import LLMResponseCache
+from llm.semantic_cache import SemanticCache
 from utils.logging import get_logger
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 logger = get_logger(__name__)
 
 
+# Default tutoring system prompt. Module-level so the multi-kilobyte string
+# is built once at import, and so it is byte-identical across calls, which
+# keeps it a cacheable prefix for provider-side prompt caching.
+DEFAULT_SYSTEM_PROMPT = """You are a friendly and expert mathematics tutor for CBSE Class 11 and 12 students.
+
+Your Goal: Provide precise, well-structured, and easy-to-understand solutions that align with the CBSE curriculum.
+
+Guidelines:
+1. **Tone**: Be encouraging, professional, and clear. Use NCERT/CBSE terminology.
+2. **Structural Style (MANDATORY)**:
+   - **Avoid Paragraphs**: Use bullet points for all explanations, definitions, and properties.
+   - **🎯 Goal**: Briefly state the objective.
+   - **💡 Key Concept**: Explain the underlying logic using bullet points.
+   - **📝 Step-by-Step Solution**: 
+     - **Place this entire section inside a Markdown blockquote (`> `) to make it stand out.**
+     - Use a logical, sequential numbered list for the derivation.
+   - **✅ Final Answer**: State the final result clearly in **bold** or within a `\boxed{}` LaTeX expression.
+   - **🚀 Pro Tip**: Mention a shortcut or common pitfall in bullet points.
+
+3. **Mathematical Formatting (CRITICAL)**:
+   - Use LaTeX for **ALL** mathematical expressions.
+   - **Inline Math**: Surround with `$ $`.
+   - **Block Math**: Surround with `$$ $$` on new lines.
+   - Always ensure symbols like $\subseteq, \in, \forall$ are correctly used.
+
+4. **Formatting**:
+   - Use `###` for main headers and `####` for sub-headers.
+   - Ensure a blank line between different headers and bullet points.
+
+5. **Visualizations (PLOTS & GRAPHS)**:
+   - **Trigger**: IF and ONLY IF the user explicitly requests a plot/graph OR the question implicitly demands a visual solution.
+   - **Constraint**:
+     - **Allowed**: You MAY generate plots for any standard mathematical concept.
+     - **Context Priority**: Use provided Context data if asked.
+     - **Strict Refusal**: Do NOT generate plots for non-academic topics.
+   - **Action**: Generate a Python code block to create the plot using `matplotlib` and `seaborn`.
+   - **Format**: 
+     - Precede the code block with: `### Visualization`
+     - Start the code block with: `\`\`\`python # PLOT`
+     - The code must be self-contained. Use `plt.title`, `plt.xlabel`, `plt.ylabel`, `plt.grid(True)`.
+     - **CRITICAL**: For coordinate geometry, ALWAYS include `plt.axhline(0, color='black', linewidth=1)` and `plt.axvline(0, color='black', linewidth=1)`.
+     - Do NOT call `plt.show()`, just create the plot.
+
+6. **Context Policy (CRITICAL)**:
+   - Your primary source is the provided textbook context.
+   - **Solve Miscellaneous Problems**: If a student asks a specific question or a miscellaneous problem that is not explicitly solved in the context, but the context provided contains the theory, formulas, and concepts of that chapter, you MUST use that information to solve the problem for the student.
+   - **Strict Boundary**: If a question is completely unrelated to the provided context, you MUST politely refuse.
+   - **Refusal phrasing**: State clearly that the topic is not found in the current textbook context.
+
+Strictly follow this structure: Goal -> Concept -> [Blocked Solution] -> [Visualization if applicable] -> Answer -> Pro Tip."""
+
+# Context window of the default llama-3.1 models, used for local preflight
+# checks so oversized prompts are trimmed before a wasted API round-trip
+MODEL_CONTEXT_LIMIT = 128_000
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars/token) without a tokenizer round-trip."""
+    return len(text) // 4
+
+
+# Rough token-count estimate for the default system prompt,
+# useful for preflight budget checks without a tokenizer round-trip.
+DEFAULT_SYSTEM_PROMPT_TOKEN_ESTIMATE = _estimate_tokens(DEFAULT_SYSTEM_PROMPT)
+
+# Per-chunk context templates, compiled once at import so the hot
+# prompt-assembly loop is format_map calls instead of re-evaluated
+# f-strings. Split in two because the Section line is optional.
+CHUNK_HEADER_TMPL = (
+    "[Context {i}]\n"
+    "Source: Class {class_level}, Chapter {chapter_number}: {chapter_name}\n"
+)
+CHUNK_BODY_TMPL = (
+    "Type: {content_type}\n"
+    "\nContent:\n{text_content}\n"
+)
+
+# User prompt template: static scaffolding first, volatile query at the end
+DEFAULT_PROMPT_TEMPLATE = """Context from textbook:
+
+{context}
+
+Please provide a comprehensive answer to the student's question below based on the context above.
+
+Student Question: {query}"""
+
+
 class GroqClient:
     """Client for Groq LLM API with multi-key rotation support."""
     
@@ -17,16 +112,18 @@ class GroqClient:
         api_key: str, # Main key passed from config/env typically, but we will look for others too
         model: str = "llama-3.1-70b-versatile",
         temperature: float = 0.1,
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        semantic_cache: Optional['SemanticCache'] = None
     ):
         """
         Initialize Groq client.
-        
+
         Args:
             api_key: Primary Groq API key
             model: Model name
             temperature: Temperature for generation
             max_tokens: Maximum tokens to generate
+            semantic_cache: Optional SemanticCache for paraphrased-query reuse
         """
         self.output_model = model
         self.temperature = temperature
@@ -48,36 +145,137 @@ class GroqClient:
         
         if not self.api_keys:
             raise ValueError("No Groq API keys found. Please set GROQ_API_KEY in environment.")
-            
+
+        # Pool sizing tuned for high-concurrency workloads: the groq SDK
+        # defaults are conservative, so under load requests queue waiting
+        # for a free connection. Generous keepalive means rotation between
+        # keys reuses warm TLS/TCP connections instead of re-handshaking.
+        self._http_limits = httpx.Limits(
+            max_connections=200,
+            max_keepalive_connections=100,
+            keepalive_expiry=30.0
+        )
+        self._http_timeout = httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0)
+
+        # Per-key health state for circuit-breaker rotation: keys that were
+        # recently rate-limited are skipped until their cooldown expires, so
+        # a throttled primary key doesn't cost a failed round-trip per call.
+        self.key_state = [{'cooldown_until': 0.0, 'failures': 0} for _ in self.api_keys]
+        self._rr_index = 0  # Round-robin start position, advanced on success
+
+        # Async clients, built on first async call (no cost for sync-only callers)
+        self.async_clients: Optional[List[AsyncGroq]] = None
+
+        # Micro-batcher for high-QPS async callers, built on first use
+        self._micro_batcher = None
+
+        # Exact-match response cache (low-temperature tutoring traffic repeats a lot)
+        self.response_cache = LLMResponseCache()
+
+        # Optional semantic cache (matches paraphrased queries over same context)
+        self.semantic_cache = semantic_cache
+
+        # Small LRU of built context strings: consecutive questions in a
+        # session usually retrieve the same chunks, so the multi-KB context
+        # block is reused instead of rebuilt every turn.
+        self._context_cache: 'OrderedDict[int, str]' = OrderedDict()
+        self._context_cache_size = 64
+
         logger.info(f"Initialized Groq client with {len(self.api_keys)} API keys available.")
         logger.info(f"Model: {self.output_model}")
         
-    def _get_client(self, api_key: str) -> Groq:
-        """Helper to create a client instance for a specific key."""
-        return Groq(api_key=api_key)
+    @functools.cached_property
+    def clients(self) -> List[Groq]:
+        """
+        Per-key sync clients, built on first network-bound call.
+
+        Deferring construction keeps __init__ (and cold start) free of
+        TLS/pool setup; requests fully served by the response or semantic
+        cache never pay for it. Once built, each Groq instance owns an
+        httpx client whose connections are pooled and kept alive across
+        requests, instead of a fresh handshake per call.
+        """
+        return [
+            Groq(
+                api_key=key,
+                http_client=httpx.Client(limits=self._http_limits, timeout=self._http_timeout)
+            )
+            for key in self.api_keys
+        ]
+
+    def _key_order(self) -> List[int]:
+        """
+        Get key indices in try order: healthy keys round-robin first.
+
+        Keys inside their cooldown window are skipped; if every key is
+        cooling down, they are tried anyway, soonest-to-recover first.
+        """
+        now = time.monotonic()
+        n = len(self.api_keys)
+        order = [(self._rr_index + offset) % n for offset in range(n)]
+
+        healthy = [i for i in order if self.key_state[i]['cooldown_until'] <= now]
+        if healthy:
+            return healthy
+
+        logger.warning("All API keys in cooldown. Trying soonest-to-recover first.")
+        return sorted(order, key=lambda i: self.key_state[i]['cooldown_until'])
+
+    def _record_key_success(self, key_index: int):
+        """Reset health state for a key after a successful call."""
+        state = self.key_state[key_index]
+        state['failures'] = 0
+        state['cooldown_until'] = 0.0
+        self._rr_index = key_index
+
+    def _record_key_failure(self, key_index: int, error: Exception):
+        """Put a failed key into a cooldown window (honors retry-after)."""
+        state = self.key_state[key_index]
+        state['failures'] += 1
+
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after'))
+            except (AttributeError, TypeError, ValueError):
+                pass
+
+        if retry_after is None:
+            # Exponential backoff capped at a minute
+            retry_after = min(2.0 ** state['failures'], 60.0)
+
+        state['cooldown_until'] = time.monotonic() + retry_after
+        logger.warning(f"Key {key_index+1} cooling down for {retry_after:.1f}s")
 
     def _completion_with_fallback(self, create_completion_func, **kwargs) -> Any:
         """
         Execute a completion request with fallback to other API keys on failure.
-        
+
         Args:
             create_completion_func: Lambda or function that takes a client and returns a response
             **kwargs: Arguments to pass to the completion function (like messages, model, etc)
         """
         last_exception = None
-        
-        for i, api_key in enumerate(self.api_keys):
+
+        for i in self._key_order():
             try:
-                # Create a fresh client for this key to ensure no stale state
-                # (Though Groq client is stateless, this is cleaner for rotation)
-                client = self._get_client(api_key)
-                
                 # Execute the specific completion logic
-                return create_completion_func(client)
-                
+                try:
+                    result = create_completion_func(self.clients[i])
+                except APIConnectionError:
+                    # One quick retry on the same key for transient network
+                    # blips before rotating (single coherent retry policy;
+                    # no nested exponential backoff layers)
+                    time.sleep(0.25 + random.random() * 0.25)
+                    result = create_completion_func(self.clients[i])
+                self._record_key_success(i)
+                return result
+
             except (RateLimitError, APIConnectionError, InternalServerError) as e:
                 logger.warning(f"Groq API error with key {i+1}/{len(self.api_keys)}: {type(e).__name__} - {str(e)}")
                 logger.warning("Rotating to next API key...")
+                self._record_key_failure(i, e)
                 last_exception = e
                 continue
             except Exception as e:
@@ -91,11 +289,89 @@ class GroqClient:
             raise last_exception
         raise RuntimeError("Unknown error: All API keys failed without specific exception.")
 
-    @retry(
-        retry=retry_if_exception_type((RateLimitError, APIConnectionError, InternalServerError)),
-        stop=stop_after_attempt(2), # Retry the *whole rotation process* twice if needed
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
+    def _get_async_clients(self) -> List[AsyncGroq]:
+        """Get (lazily building) the async client per key."""
+        if self.async_clients is None:
+            self.async_clients = [
+                AsyncGroq(
+                    api_key=key,
+                    http_client=httpx.AsyncClient(
+                        limits=self._http_limits, timeout=self._http_timeout
+                    )
+                )
+                for key in self.api_keys
+            ]
+        return self.async_clients
+
+    async def _async_completion_with_fallback(self, create_completion_func) -> Any:
+        """
+        Async variant of _completion_with_fallback.
+
+        Awaiting the Groq call instead of blocking lets an asyncio event
+        loop overlap the network wait of concurrent requests rather than
+        serializing them. The best-ranked key is tried alone first (no
+        wasted quota on healthy days); only once it has failed are the
+        remaining keys raced concurrently, so an outage costs roughly one
+        timeout instead of one timeout per key.
+        """
+        async_clients = self._get_async_clients()
+        order = self._key_order()
+
+        # Sequential attempt on the healthiest key
+        first = order[0]
+        try:
+            try:
+                result = await create_completion_func(async_clients[first])
+            except APIConnectionError:
+                # One quick same-key retry for transient network blips
+                await asyncio.sleep(0.25 + random.random() * 0.25)
+                result = await create_completion_func(async_clients[first])
+            self._record_key_success(first)
+            return result
+        except (RateLimitError, APIConnectionError, InternalServerError) as e:
+            logger.warning(f"Groq API error with key {first+1}/{len(self.api_keys)}: {type(e).__name__} - {str(e)}")
+            self._record_key_failure(first, e)
+            last_exception = e
+        except Exception as e:
+            # For input validation errors or other non-transient errors, don't rotate
+            logger.error(f"Unrecoverable Groq API error: {e}")
+            raise e
+
+        if len(order) == 1:
+            logger.error("All Groq API keys exhausted.")
+            raise last_exception
+
+        # Primary key failed: race the remaining keys, first success wins
+        logger.warning("Probing remaining API keys in parallel...")
+        tasks = {
+            asyncio.create_task(create_completion_func(async_clients[i])): i
+            for i in order[1:]
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    i = tasks[task]
+                    error = task.exception()
+                    if error is None:
+                        self._record_key_success(i)
+                        return task.result()
+                    if isinstance(error, (RateLimitError, APIConnectionError, InternalServerError)):
+                        logger.warning(f"Groq API error with key {i+1}/{len(self.api_keys)}: {type(error).__name__} - {str(error)}")
+                        self._record_key_failure(i, error)
+                        last_exception = error
+                    else:
+                        logger.error(f"Unrecoverable Groq API error: {error}")
+                        raise error
+        finally:
+            # First success (or hard failure) cancels the losers
+            for task in pending:
+                task.cancel()
+
+        logger.error("All Groq API keys exhausted.")
+        raise last_exception
+
     def generate(
         self,
         prompt: str,
@@ -106,154 +382,445 @@ class GroqClient:
         """
         Generate response from prompt.
         """
-        messages = []
-        
-        if system_prompt:
-            messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-        
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
-        
+        # Tuple literal: one allocation, no append churn on the hot path
+        messages = (
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ) if system_prompt else (
+            {"role": "user", "content": prompt},
+        )
+
+        effective_temperature = temperature or self.temperature
+        effective_max_tokens = max_tokens or self.max_tokens
+
+        # Short-circuit identical requests from the cache
+        cache_key = LLMResponseCache.cache_key(
+            self.output_model, messages, effective_temperature, effective_max_tokens
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         def _do_generate(client):
             response = client.chat.completions.create(
                 model=self.output_model,
                 messages=messages,
-                temperature=temperature or self.temperature,
-                max_tokens=max_tokens or self.max_tokens
+                temperature=effective_temperature,
+                max_tokens=effective_max_tokens
             )
             return {
                 "content": response.choices[0].message.content,
                 "model": response.model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+                "usage": response.usage.model_dump(
+                    include={"prompt_tokens", "completion_tokens", "total_tokens"}
+                )
             }
-            
-        return self._completion_with_fallback(_do_generate)
+
+        result = self._completion_with_fallback(_do_generate)
+        self.response_cache.set(cache_key, result)
+        return result
     
-    @retry(
-        retry=retry_if_exception_type((RateLimitError, APIConnectionError, InternalServerError)),
-        stop=stop_after_attempt(2),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
+    def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        flush_interval: float = 0.05,
+        flush_tokens: int = 8
+    ) -> Iterator[str]:
+        """
+        Generate response as a stream of text chunks.
+
+        Instead of blocking until the full completion arrives, tokens are
+        yielded as they are generated, so callers can show output after
+        the first few hundred milliseconds. Small deltas are batched
+        (every `flush_tokens` deltas or `flush_interval` seconds) to
+        avoid per-token overhead downstream.
+        """
+        messages = (
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ) if system_prompt else (
+            {"role": "user", "content": prompt},
+        )
+
+        def _do_stream(client):
+            return client.chat.completions.create(
+                model=self.output_model,
+                messages=messages,
+                temperature=temperature or self.temperature,
+                max_tokens=max_tokens or self.max_tokens,
+                stream=True
+            )
+
+        stream = self._completion_with_fallback(_do_stream)
+
+        buffer = []
+        last_flush = time.monotonic()
+
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                buffer.append(delta)
+
+            now = time.monotonic()
+            if buffer and (len(buffer) >= flush_tokens or now - last_flush >= flush_interval):
+                yield ''.join(buffer)
+                buffer.clear()
+                last_flush = now
+
+        if buffer:
+            yield ''.join(buffer)
+
     def generate_with_context(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        scores: Optional[List[float]] = None,
+        allowed_content_types: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Generate response with retrieved context.
+
+        Args:
+            query: User query
+            context_chunks: Retrieved chunks, ranked best-first
+            system_prompt: Optional system prompt override
+            scores: Optional retrieval scores aligned with context_chunks;
+                when given, weakly-relevant chunks are pruned
+            allowed_content_types: Optional content-type whitelist
         """
-        # Build context string
-        context_parts = []
-        
+        context_chunks = self._prune_context_chunks(
+            context_chunks, scores, allowed_content_types
+        )
+        context_chunks = self._fit_context_budget(query, context_chunks, system_prompt)
+
+        # Semantic cache: reuse answers to paraphrased questions over the same context
+        if self.semantic_cache:
+            cached = self.semantic_cache.get(query, context_chunks)
+            if cached is not None:
+                return cached
+
+        full_prompt = self._build_context_prompt(query, context_chunks)
+
+        result = self.generate(
+            prompt=full_prompt,
+            system_prompt=system_prompt or self._get_default_system_prompt()
+        )
+
+        if self.semantic_cache:
+            self.semantic_cache.set(query, context_chunks, result)
+
+        return result
+
+    def _prune_context_chunks(
+        self,
+        context_chunks: List[Dict[str, Any]],
+        scores: Optional[List[float]] = None,
+        allowed_content_types: Optional[List[str]] = None,
+        min_score_ratio: float = 0.35
+    ) -> List[Dict[str, Any]]:
+        """
+        Drop weakly-relevant chunks before prompt assembly.
+
+        Prompt tokens cost latency and money; chunks the model can't use
+        only dilute the context. When retrieval scores are supplied,
+        chunks scoring below `min_score_ratio` of the best score are
+        dropped (a relative cut, since RRF and cosine scores live on
+        different scales). A content-type whitelist lets callers exclude
+        types irrelevant to the query intent. The best-ranked chunk is
+        always kept.
+        """
+        chunks = list(context_chunks)
+        if not chunks:
+            return chunks
+
+        if scores is not None and len(scores) == len(chunks):
+            ranked = sorted(zip(scores, chunks), key=lambda pair: pair[0], reverse=True)
+            best_score = ranked[0][0]
+            if best_score > 0:
+                ranked = [
+                    (score, chunk) for score, chunk in ranked
+                    if score >= best_score * min_score_ratio
+                ]
+            chunks = [chunk for _, chunk in ranked]
+
+        if allowed_content_types is not None:
+            filtered = [
+                chunk for chunk in chunks
+                if chunk.get('content_type') in allowed_content_types
+            ]
+            # Never prune to nothing; fall back to the best-ranked chunk
+            chunks = filtered if filtered else chunks[:1]
+
+        dropped = len(context_chunks) - len(chunks)
+        if dropped:
+            logger.info(f"Pruned {dropped} weakly-relevant context chunk(s) before prompt assembly")
+        return chunks
+
+    def _fit_context_budget(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Trim context to fit the model window before any API call.
+
+        Oversized prompts would otherwise only fail after a full network
+        round-trip. Chunks arrive ranked best-first from the retriever,
+        so lowest-ranked chunks are dropped from the tail until the
+        estimated prompt plus completion budget fits the context limit.
+        """
+        system_tokens = (
+            _estimate_tokens(system_prompt) if system_prompt
+            else DEFAULT_SYSTEM_PROMPT_TOKEN_ESTIMATE
+        )
+        budget = MODEL_CONTEXT_LIMIT - self.max_tokens - system_tokens
+
+        chunks = list(context_chunks)
+        dropped = 0
+        while chunks and _estimate_tokens(self._build_context_prompt(query, chunks)) > budget:
+            chunks.pop()
+            dropped += 1
+
+        if dropped:
+            logger.warning(
+                f"Dropped {dropped} lowest-ranked context chunk(s) to fit the model context window"
+            )
+        return chunks
+
+    def _build_context_prompt(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]]
+    ) -> str:
+        """
+        Build the full user prompt from retrieved context chunks and query.
+
+        Ordering contract: static/slow-changing content (context chunks,
+        instructions) comes first and the volatile query goes at the very
+        end, so provider-side prefix caching can reuse the shared prefix
+        across follow-up questions on the same chapter. Don't inject
+        per-request data ahead of the query.
+        """
+        context_str = self._build_context_string(context_chunks)
+        return DEFAULT_PROMPT_TEMPLATE.format(context=context_str, query=query)
+
+    @staticmethod
+    def _context_fingerprint(context_chunks: List[Dict[str, Any]]) -> int:
+        """Cheap stable fingerprint of a context chunk list."""
+        return hash(tuple(
+            (
+                chunk.get('class_level'),
+                chunk.get('chapter_number'),
+                chunk.get('section_name'),
+                chunk.get('content_type'),
+                len(chunk.get('text_content', '')),
+                chunk.get('text_content', '')[:64]
+            )
+            for chunk in context_chunks
+        ))
+
+    def _build_context_string(self, context_chunks: List[Dict[str, Any]]) -> str:
+        """
+        Build the formatted context block, memoized per chunk set.
+
+        Consecutive questions in a session usually retrieve the same
+        chunks, so on a fingerprint hit the multi-KB block is reused and
+        only the query-dependent formatting remains.
+        """
+        ctx_key = self._context_fingerprint(context_chunks)
+        cached = self._context_cache.get(ctx_key)
+        if cached is not None:
+            self._context_cache.move_to_end(ctx_key)
+            return cached
+
+        # Build context string into one linear buffer (no intermediate
+        # parts list; a handful of writes per chunk instead of 8+ appends)
+        buf = io.StringIO()
+
         for i, chunk in enumerate(context_chunks, 1):
-            context_parts.append(f"[Context {i}]")
-            context_parts.append(f"Source: Class {chunk['class_level']}, Chapter {chunk['chapter_number']}: {chunk['chapter_name']}")
-            
+            row = {**chunk, 'i': i}
+            buf.write(CHUNK_HEADER_TMPL.format_map(row))
+
             if chunk.get('section_name'):
-                context_parts.append(f"Section: {chunk['section_name']}")
-            
-            context_parts.append(f"Type: {chunk['content_type']}")
-            context_parts.append(f"\nContent:\n{chunk['text_content']}")
-            
+                buf.write("Section: " + chunk['section_name'] + "\n")
+
+            buf.write(CHUNK_BODY_TMPL.format_map(row))
+
             if chunk.get('images'):
-                context_parts.append(f"\n[Contains {len(chunk['images'])} image(s)]")
+                buf.write(f"\n[Contains {len(chunk['images'])} image(s)]\n")
                 for img in chunk['images']:
                     if img.get('description'):
-                        context_parts.append(f"  - {img['description']}")
-            
+                        buf.write(f"  - {img['description']}\n")
+
             if chunk.get('tables'):
-                context_parts.append(f"\n[Contains {len(chunk['tables'])} table(s)]")
-            
-            context_parts.append("\n" + "="*80 + "\n")
-        
-        context_str = "\n".join(context_parts)
-        
-        # Create prompt
-        default_system = """You are a friendly and expert mathematics tutor for CBSE Class 11 and 12 students.
+                buf.write(f"\n[Contains {len(chunk['tables'])} table(s)]\n")
 
-Your Goal: Provide precise, well-structured, and easy-to-understand solutions that align with the CBSE curriculum.
+            buf.write("\n" + "="*80 + "\n\n")
 
-Guidelines:
-1. **Tone**: Be encouraging, professional, and clear. Use NCERT/CBSE terminology.
-2. **Structural Style (MANDATORY)**:
-   - **Avoid Paragraphs**: Use bullet points for all explanations, definitions, and properties.
-   - **🎯 Goal**: Briefly state the objective.
-   - **💡 Key Concept**: Explain the underlying logic using bullet points.
-   - **📝 Step-by-Step Solution**: 
-     - **Place this entire section inside a Markdown blockquote (`> `) to make it stand out.**
-     - Use a logical, sequential numbered list for the derivation.
-   - **✅ Final Answer**: State the final result clearly in **bold** or within a `\boxed{}` LaTeX expression.
-   - **🚀 Pro Tip**: Mention a shortcut or common pitfall in bullet points.
+        context_str = buf.getvalue()
 
-3. **Mathematical Formatting (CRITICAL)**:
-   - Use LaTeX for **ALL** mathematical expressions.
-   - **Inline Math**: Surround with `$ $`.
-   - **Block Math**: Surround with `$$ $$` on new lines.
-   - Always ensure symbols like $\subseteq, \in, \forall$ are correctly used.
+        self._context_cache[ctx_key] = context_str
+        while len(self._context_cache) > self._context_cache_size:
+            self._context_cache.popitem(last=False)
 
-4. **Formatting**:
-   - Use `###` for main headers and `####` for sub-headers.
-   - Ensure a blank line between different headers and bullet points.
+        return context_str
 
-5. **Visualizations (PLOTS & GRAPHS)**:
-   - **Trigger**: IF and ONLY IF the user explicitly requests a plot/graph OR the question implicitly demands a visual solution.
-   - **Constraint**:
-     - **Allowed**: You MAY generate plots for any standard mathematical concept.
-     - **Context Priority**: Use provided Context data if asked.
-     - **Strict Refusal**: Do NOT generate plots for non-academic topics.
-   - **Action**: Generate a Python code block to create the plot using `matplotlib` and `seaborn`.
-   - **Format**: 
-     - Precede the code block with: `### Visualization`
-     - Start the code block with: `\`\`\`python # PLOT`
-     - The code must be self-contained. Use `plt.title`, `plt.xlabel`, `plt.ylabel`, `plt.grid(True)`.
-     - **CRITICAL**: For coordinate geometry, ALWAYS include `plt.axhline(0, color='black', linewidth=1)` and `plt.axvline(0, color='black', linewidth=1)`.
-     - Do NOT call `plt.show()`, just create the plot.
+    def _get_default_system_prompt(self) -> str:
+        """Get the default tutoring system prompt."""
+        return DEFAULT_SYSTEM_PROMPT
 
-6. **Context Policy (CRITICAL)**:
-   - Your primary source is the provided textbook context.
-   - **Solve Miscellaneous Problems**: If a student asks a specific question or a miscellaneous problem that is not explicitly solved in the context, but the context provided contains the theory, formulas, and concepts of that chapter, you MUST use that information to solve the problem for the student.
-   - **Strict Boundary**: If a question is completely unrelated to the provided context, you MUST politely refuse.
-   - **Refusal phrasing**: State clearly that the topic is not found in the current textbook context.
+    def create_chat_history(
+        self,
+        messages: List[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        """
+        Generate response with chat history.
+        """
+        cache_key = LLMResponseCache.cache_key(
+            self.output_model, messages, self.temperature, self.max_tokens
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-Strictly follow this structure: Goal -> Concept -> [Blocked Solution] -> [Visualization if applicable] -> Answer -> Pro Tip."""
-        
-        full_prompt = f"""Context from textbook:
+        def _do_chat(client):
+            response = client.chat.completions.create(
+                model=self.output_model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+            return {
+                "content": response.choices[0].message.content,
+                "model": response.model,
+                "usage": response.usage.model_dump(
+                    include={"prompt_tokens", "completion_tokens", "total_tokens"}
+                )
+            }
 
-{context_str}
+        result = self._completion_with_fallback(_do_chat)
+        self.response_cache.set(cache_key, result)
+        return result
 
-Student Question: {query}
+    def get_micro_batcher(self):
+        """
+        Get (lazily creating) a MicroBatcher that dispatches agenerate calls.
 
-Please provide a comprehensive answer based on the context above."""
-        
-        return self.generate(
+        Concurrent callers submit payloads of agenerate keyword arguments;
+        requests arriving within the batching window are dispatched to the
+        API in parallel:
+
+            await client.get_micro_batcher().submit({'prompt': '...'})
+        """
+        if self._micro_batcher is None:
+            from llm.batcher import MicroBatcher
+
+            async def _dispatch(payload):
+                return await self.agenerate(**payload)
+
+            self._micro_batcher = MicroBatcher(_dispatch)
+        return self._micro_batcher
+
+    async def agenerate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate for use from async frameworks.
+        """
+        messages = (
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ) if system_prompt else (
+            {"role": "user", "content": prompt},
+        )
+
+        effective_temperature = temperature or self.temperature
+        effective_max_tokens = max_tokens or self.max_tokens
+
+        cache_key = LLMResponseCache.cache_key(
+            self.output_model, messages, effective_temperature, effective_max_tokens
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        async def _do_generate(client):
+            response = await client.chat.completions.create(
+                model=self.output_model,
+                messages=messages,
+                temperature=effective_temperature,
+                max_tokens=effective_max_tokens
+            )
+            return {
+                "content": response.choices[0].message.content,
+                "model": response.model,
+                "usage": response.usage.model_dump(
+                    include={"prompt_tokens", "completion_tokens", "total_tokens"}
+                )
+            }
+
+        result = await self._async_completion_with_fallback(_do_generate)
+        self.response_cache.set(cache_key, result)
+        return result
+
+    async def agenerate_with_context(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None,
+        scores: Optional[List[float]] = None,
+        allowed_content_types: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate_with_context.
+        """
+        context_chunks = self._prune_context_chunks(
+            context_chunks, scores, allowed_content_types
+        )
+        context_chunks = self._fit_context_budget(query, context_chunks, system_prompt)
+
+        if self.semantic_cache:
+            cached = self.semantic_cache.get(query, context_chunks)
+            if cached is not None:
+                return cached
+
+        full_prompt = self._build_context_prompt(query, context_chunks)
+
+        result = await self.agenerate(
             prompt=full_prompt,
-            system_prompt=system_prompt or default_system
+            system_prompt=system_prompt or self._get_default_system_prompt()
         )
-    
-    @retry(
-        retry=retry_if_exception_type((RateLimitError, APIConnectionError, InternalServerError)),
-        stop=stop_after_attempt(2),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
-    def create_chat_history(
+
+        if self.semantic_cache:
+            self.semantic_cache.set(query, context_chunks, result)
+
+        return result
+
+    async def acreate_chat_history(
         self,
         messages: List[Dict[str, str]]
     ) -> Dict[str, Any]:
         """
-        Generate response with chat history.
+        Async variant of create_chat_history.
         """
-        def _do_chat(client):
-            response = client.chat.completions.create(
+        cache_key = LLMResponseCache.cache_key(
+            self.output_model, messages, self.temperature, self.max_tokens
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        async def _do_chat(client):
+            response = await client.chat.completions.create(
                 model=self.output_model,
                 messages=messages,
                 temperature=self.temperature,
@@ -262,11 +829,11 @@ Please provide a comprehensive answer based on the context above."""
             return {
                 "content": response.choices[0].message.content,
                 "model": response.model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+                "usage": response.usage.model_dump(
+                    include={"prompt_tokens", "completion_tokens", "total_tokens"}
+                )
             }
-            
-        return self._completion_with_fallback(_do_chat)
\ No newline at end of file
+
+        result = await self._async_completion_with_fallback(_do_chat)
+        self.response_cache.set(cache_key, result)
+        return result
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""Semantic cache for LLM responses keyed on query meaning."""
+
+import hashlib
+import pickle
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SemanticCache:
+    """
+    Cache LLM responses by query similarity rather than exact text.
+
+    Students phrase the same question many ways ("find derivative of
+    sin x" vs "what's d/dx sin x"). Queries are embedded locally and a
+    cosine-similarity lookup against prior queries returns the cached
+    response when similarity exceeds the threshold AND the retrieved
+    context is the same.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        similarity_threshold: float = 0.92,
+        max_entries: int = 2048,
+        persist_path: Optional[str] = None,
+        persist_every: int = 32
+    ):
+        """
+        Initialize semantic cache.
+
+        Args:
+            model_name: Sentence transformer model for query embeddings
+            similarity_threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum cached entries before oldest are dropped
+            persist_path: Optional path to persist cache to disk
+            persist_every: Persist after this many new entries
+        """
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_every = persist_every
+
+        self._model = None  # Lazy-loaded SentenceTransformer
+        self._embeddings: Optional[np.ndarray] = None  # (N, dim) normalized
+        self._payloads: List[Dict[str, Any]] = []  # (response, fingerprint) per row
+        self._adds_since_persist = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.persist_path and self.persist_path.exists():
+            self._load()
+
+    @staticmethod
+    def context_fingerprint(context_chunks: List[Dict[str, Any]]) -> str:
+        """Fingerprint the retrieved context so stale answers are never reused."""
+        hasher = hashlib.sha256()
+        for chunk in context_chunks:
+            hasher.update(chunk.get('text_content', '').encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _get_model(self):
+        """Load the embedding model on first use."""
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            logger.info(f"Loading semantic cache embedding model: {self.model_name}")
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _embed(self, query: str) -> np.ndarray:
+        embedding = self._get_model().encode(
+            query,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.asarray(embedding, dtype=np.float32)
+
+    def get(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response for a semantically similar query.
+
+        Args:
+            query: User query
+            context_chunks: Context chunks for this request
+
+        Returns:
+            Cached response dict, or None on miss
+        """
+        if self._embeddings is None or len(self._payloads) == 0:
+            self.misses += 1
+            return None
+
+        query_embedding = self._embed(query)
+
+        # Cosine similarity over all cached queries (embeddings are normalized)
+        similarities = self._embeddings @ query_embedding
+        best_idx = int(np.argmax(similarities))
+        best_sim = float(similarities[best_idx])
+
+        if best_sim < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        response, fingerprint = self._payloads[best_idx]
+        if fingerprint != self.context_fingerprint(context_chunks):
+            # Same question but different retrieved context; don't reuse
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        logger.info(f"Semantic cache hit (similarity={best_sim:.3f})")
+        return response
+
+    def set(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        response: Dict[str, Any]
+    ):
+        """Cache a response under the query's embedding."""
+        query_embedding = self._embed(query).reshape(1, -1)
+
+        if self._embeddings is None:
+            self._embeddings = query_embedding
+        else:
+            self._embeddings = np.vstack([self._embeddings, query_embedding])
+
+        self._payloads.append((response, self.context_fingerprint(context_chunks)))
+
+        # Drop oldest entries when full
+        if len(self._payloads) > self.max_entries:
+            overflow = len(self._payloads) - self.max_entries
+            self._embeddings = self._embeddings[overflow:]
+            self._payloads = self._payloads[overflow:]
+
+        self._adds_since_persist += 1
+        if self.persist_path and self._adds_since_persist >= self.persist_every:
+            self._persist()
+
+    def _persist(self):
+        """Persist embeddings and payloads to disk."""
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.persist_path, 'wb') as f:
+                pickle.dump({
+                    'embeddings': self._embeddings,
+                    'payloads': self._payloads
+                }, f)
+            self._adds_since_persist = 0
+            logger.debug(f"Persisted semantic cache ({len(self._payloads)} entries)")
+        except Exception as e:
+            logger.warning(f"Failed to persist semantic cache: {e}")
+
+    def _load(self):
+        """Load persisted cache from disk."""
+        try:
+            with open(self.persist_path, 'rb') as f:
+                data = pickle.load(f)
+            self._embeddings = data['embeddings']
+            self._payloads = data['payloads']
+            logger.info(f"Loaded semantic cache ({len(self._payloads)} entries)")
+        except Exception as e:
+            logger.warning(f"Failed to load semantic cache: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        return {
+            'entries': len(self._payloads),
+            'hits': self.hits,
+            'misses': self.misses,
+            'similarity_threshold': self.similarity_threshold
+        }
@@ -1,5 +1,8 @@
 """Retrieval system for finding relevant chunks."""
 
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 import numpy as np
 import re
@@ -14,6 +17,24 @@ logger = get_logger(__name__)
 
 from retrieval.keyword_retriever import KeywordRetriever
 
+# Entity/example patterns, compiled once at import so query classification
+# runs a single precompiled search instead of rebuilding patterns per query.
+# Matches "Example 5", "Ex 5.1", "Exercise 3.2", "Q 1", "Problem 2" etc.
+_ENTITY_RE = re.compile(
+    r'(?:example|ex|exercise|question|q|problem)\s*\d+',
+    re.IGNORECASE
+)
+_EXAMPLE_NUM_RE = re.compile(
+    r'(?:example\s+|ex\.\s*)(\d+(?:\.\d+)?)',
+    re.IGNORECASE
+)
+# Pattern for "example 2 to 5" or "examples 2-5"
+_EXAMPLE_RANGE_RE = re.compile(
+    r'examples?\s+(\d+)\s*(?:to|-)\s*(\d+)',
+    re.IGNORECASE
+)
+
+
 class HybridRetriever:
     """Hybrid retrieval combining vector search, keyword search, and metadata filtering."""
     
@@ -43,7 +64,19 @@ class HybridRetriever:
         self.top_k = config.get('top_k', 5)
         self.similarity_threshold = config.get('similarity_threshold', 0.7)
         self.alpha = config.get('alpha', 0.7) # Vector weight (0.0 to 1.0)
-        
+
+        # Query-level LRU: repeated (query, k, filters) requests skip
+        # embedding, both searches, fusion and metadata fetch
+        self._retrieve_cached = functools.lru_cache(maxsize=256)(self._retrieve_impl)
+
+        # Candidate-level LRU shared across filter variants: retrieve_by_*
+        # calls for the same query reuse one embedding + FAISS + BM25 pass
+        self._candidates_cached = functools.lru_cache(maxsize=64)(self._retrieve_candidates)
+
+        # Overlaps the keyword search with embedding + vector search
+        # (FAISS and large NumPy ops release the GIL)
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
         logger.info("Initialized hybrid retriever (Vector + Keyword)")
     
     def retrieve(
@@ -64,6 +97,40 @@ class HybridRetriever:
             List of retrieval results
         """
         k = top_k or self.top_k
+        filters_key = tuple(sorted(filters.items())) if filters else None
+        return self._retrieve_cached(query, k, filters_key)
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """
+        Async variant of retrieve for concurrent callers.
+
+        Runs the sync pipeline on the default executor so an asyncio
+        caller can gather many independent queries; FAISS and large
+        NumPy operations release the GIL, so gathered retrievals
+        genuinely overlap across cores.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.retrieve, query, top_k, filters)
+        )
+
+    def clear_query_cache(self):
+        """Drop cached query results (call after re-indexing)."""
+        self._retrieve_cached.cache_clear()
+        self._candidates_cached.cache_clear()
+
+    def _retrieve_impl(
+        self,
+        query: str,
+        k: int,
+        filters_key: Optional[tuple]
+    ) -> List[RetrievalResult]:
+        """Uncached retrieval body behind the query-level LRU."""
+        filters = dict(filters_key) if filters_key else None
         logger.info(f"Hybrid retrieving top {k} results for query: {query[:50]}...")
         
         # 1. Dynamic Weighting Logic
@@ -76,52 +143,100 @@ class HybridRetriever:
             logger.info("Detected Entity Query (Example/Exercise) -> Boosting Keyword Search")
             current_alpha = 0.3 # Favor Keyword (0.3 Vector, 0.7 Keyword)
             
-        # 1. Vector Search
-        query_embedding = self.embedding_generator.generate_embedding(query)
+        # 1+2. Vector and Keyword Search. Candidates are filter-independent
+        # and cached, so cascaded calls like retrieve_by_type followed by
+        # a retrieve fallback pay for embedding + FAISS + BM25 only once.
+        vector_candidates, keyword_results = self._candidates_cached(query, k)
+
+        allowed_ids = None
         if filters:
             filtered_chunks = self.metadata_store.filter_chunks(**filters)
-            filtered_ids = [chunk['chunk_id'] for chunk in filtered_chunks]
-            vector_results = self.vector_store.search_with_filter(query_embedding, k * 2, filtered_ids)
+            # Frozen set for O(1) membership checks in the fusion loop
+            allowed_ids = frozenset(chunk['chunk_id'] for chunk in filtered_chunks)
+            vector_results = [
+                pair for pair in vector_candidates if pair[0] in allowed_ids
+            ][:k * 2]
         else:
-            vector_results = self.vector_store.search(query_embedding, k * 2)
-            
-        # 2. Keyword Search
-        keyword_results = self.keyword_retriever.search(query, top_k=k * 2)
-        
-        # 3. Fuse Scores
-        fused_scores = {}
-        
-        # Helper for RRF
-        def apply_rrf(results, rank_constant=60, weight=1.0):
-            for rank, (chunk_id, _) in enumerate(results):
-                if filters:
-                    # Double check filter for keyword results
-                    chunk = self.metadata_store.get_chunk(chunk_id)
-                    if not chunk: continue
-                    match = True
-                    for key, val in filters.items():
-                        if chunk.get(key) != val:
-                            match = False
-                            break
-                    if not match: continue
-                
-                if chunk_id not in fused_scores:
-                    fused_scores[chunk_id] = 0.0
-                fused_scores[chunk_id] += weight * (1 / (rank_constant + rank + 1))
+            vector_results = list(vector_candidates[:k * 2])
 
-        apply_rrf(vector_results, weight=current_alpha)
-        apply_rrf(keyword_results, weight=(1.0 - current_alpha))
-        
-        # Sort by fused score
-        sorted_results = sorted(fused_scores.items(), key=lambda x: x[1], reverse=True)[:k]
-        
-        # Get chunks and create retrieval results
+        retrieval_results = self._fuse_and_hydrate(
+            vector_results, keyword_results, k, current_alpha, allowed_ids
+        )
+
+        logger.info(f"Retrieved {len(retrieval_results)} hybrid results")
+        return retrieval_results
+
+    def _retrieve_candidates(self, query: str, k: int) -> tuple:
+        """
+        Get filter-independent vector and keyword candidates for a query.
+
+        The keyword search runs on the worker thread while this thread
+        does the embedding forward pass and the FAISS search. Vector
+        candidates are over-fetched 10x (matching the old
+        search_with_filter behavior) so metadata filters can be applied
+        afterwards without a second index search.
+        """
+        keyword_future = self._executor.submit(self.keyword_retriever.search, query, k * 2)
+
+        query_embedding = self.embedding_generator.generate_embedding(query)
+        vector_candidates = self.vector_store.search(query_embedding, k * 20)
+
+        return vector_candidates, keyword_future.result()
+
+    def _fuse_and_hydrate(
+        self,
+        vector_results: List[tuple],
+        keyword_results: List[tuple],
+        k: int,
+        current_alpha: float,
+        allowed_ids: Optional[frozenset] = None
+    ) -> List[RetrievalResult]:
+        """Fuse vector and keyword candidates with RRF and hydrate chunks."""
+        # Fuse Scores (vectorized RRF)
+        # Vector results are already pre-filtered via search_with_filter;
+        # only keyword results need the set-membership check. Keyword ranks
+        # keep their original positions even when entries are filtered out.
+        rank_constant = 60
+        vector_ids = [chunk_id for chunk_id, _ in vector_results]
+        keyword_pairs = [
+            (rank, chunk_id)
+            for rank, (chunk_id, _) in enumerate(keyword_results)
+            if allowed_ids is None or chunk_id in allowed_ids
+        ]
+
+        all_ids = np.array(
+            vector_ids + [chunk_id for _, chunk_id in keyword_pairs]
+        )
+        if len(all_ids) == 0:
+            sorted_results = []
+        else:
+            rrf_vector = current_alpha / (rank_constant + np.arange(len(vector_ids)) + 1)
+            keyword_ranks = np.array([rank for rank, _ in keyword_pairs])
+            rrf_keyword = (1.0 - current_alpha) / (rank_constant + keyword_ranks + 1)
+
+            # One unique-id map plus a scatter-add replaces the per-result
+            # Python dict arithmetic
+            unique_ids, inverse = np.unique(all_ids, return_inverse=True)
+            fused = np.zeros(len(unique_ids))
+            np.add.at(fused, inverse, np.concatenate([rrf_vector, rrf_keyword]))
+
+            top_n = min(k, len(unique_ids))
+            idx = np.argpartition(fused, -top_n)[-top_n:]
+            order = idx[np.argsort(fused[idx])[::-1]]
+            sorted_results = [(str(unique_ids[i]), float(fused[i])) for i in order]
+
+        # Get chunks and create retrieval results (one batched metadata fetch)
+        chunk_data_by_id = self.metadata_store.get_chunks_batch(
+            [chunk_id for chunk_id, _ in sorted_results]
+        )
         retrieval_results = []
         for rank, (chunk_id, score) in enumerate(sorted_results, 1):
-            chunk_data = self.metadata_store.get_chunk(chunk_id)
+            chunk_data = chunk_data_by_id.get(chunk_id)
             if chunk_data:
                 try:
-                    chunk = ContentChunk.from_dict(chunk_data)
+                    # Lazy hydration: nested image/table/equation objects
+                    # decode only if a consumer actually touches them
+                    chunk = ContentChunk.from_dict_lazy(chunk_data)
                     retrieval_results.append(RetrievalResult(
                         chunk=chunk,
                         score=score,
@@ -129,10 +244,50 @@ class HybridRetriever:
                     ))
                 except Exception as e:
                     logger.error(f"Error converting chunk {chunk_id}: {e}")
-        
-        logger.info(f"Retrieved {len(retrieval_results)} hybrid results")
+
         return retrieval_results
-    
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None
+    ) -> List[List[RetrievalResult]]:
+        """
+        Retrieve relevant chunks for several queries at once.
+
+        One batched embedding forward pass and one FAISS call over the
+        stacked query matrix amortize model and index overhead across
+        queries; keyword searches run on the worker pool meanwhile.
+
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+
+        Returns:
+            One list of retrieval results per query
+        """
+        if not queries:
+            return []
+
+        k = top_k or self.top_k
+        logger.info(f"Hybrid batch-retrieving top {k} results for {len(queries)} queries")
+
+        keyword_futures = [
+            self._executor.submit(self.keyword_retriever.search, query, k * 2)
+            for query in queries
+        ]
+
+        query_embeddings = self.embedding_generator.generate_batch_embeddings(queries)
+        vector_lists = self.vector_store.search_batch(query_embeddings, k * 2)
+
+        batch_results = []
+        for query, vector_results, keyword_future in zip(queries, vector_lists, keyword_futures):
+            current_alpha = 0.3 if self._is_entity_query(query) else self.alpha
+            batch_results.append(self._fuse_and_hydrate(
+                vector_results, keyword_future.result(), k, current_alpha
+            ))
+        return batch_results
+
     def retrieve_by_type(
         self,
         query: str,
@@ -160,21 +315,7 @@ class HybridRetriever:
         """
         Check if query is asking for a specific entity (Example X, Exercise Y).
         """
-        import re
-        # patterns for "Example 5", "Ex 5.1", "Exercise 3.2", "Q 1"
-        patterns = [
-            r'example\s*\d+',
-            r'ex\s*\d+',
-            r'exercise\s*\d+',
-            r'question\s*\d+',
-            r'q\s*\d+',
-            r'problem\s*\d+'
-        ]
-        
-        for pattern in patterns:
-            if re.search(pattern, query, re.IGNORECASE):
-                return True
-        return False
+        return _ENTITY_RE.search(query) is not None
     
     def retrieve_from_chapter(
         self,
@@ -252,6 +393,27 @@ class HybridRetriever:
         Returns:
             Example results
         """
+        # Direct index lookup: the metadata store knows exactly which
+        # chunks carry this example number, so no vector/keyword search
+        # is needed when the index has a hit.
+        k = top_k or self.top_k
+        indexed_chunks = self.metadata_store.get_by_example(example_number)
+        if indexed_chunks:
+            retrieval_results = []
+            for rank, chunk_data in enumerate(indexed_chunks[:k], 1):
+                try:
+                    chunk = ContentChunk.from_dict_lazy(chunk_data)
+                    retrieval_results.append(RetrievalResult(
+                        chunk=chunk,
+                        score=1.0,  # Exact metadata match
+                        rank=rank
+                    ))
+                except Exception as e:
+                    logger.error(f"Error converting chunk {chunk_data.get('chunk_id')}: {e}")
+            if retrieval_results:
+                return retrieval_results
+
+        # Fall back to the filtered hybrid path
         return self.retrieve(
             query=query,
             top_k=top_k,
@@ -297,10 +459,8 @@ class QueryClassifier:
     
     def extract_example_range(self, query: str) -> Optional[List[str]]:
         """Extract a range of example numbers from query."""
-        # Pattern for "example 2 to 5" or "examples 2-5"
-        pattern = r'examples?\s+(\d+)\s*(?:to|-)\s*(\d+)'
-        match = re.search(pattern, query, re.IGNORECASE)
-        
+        match = _EXAMPLE_RANGE_RE.search(query)
+
         if match:
             start = int(match.group(1))
             end = int(match.group(2))
@@ -318,15 +478,9 @@ class QueryClassifier:
 
     def extract_example_number(self, query: str) -> Optional[str]:
         """Extract example number from query."""
-        patterns = [
-            r'example\s+(\d+(?:\.\d+)?)',
-            r'ex\.\s*(\d+(?:\.\d+)?)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return match.group(1)
+        match = _EXAMPLE_NUM_RE.search(query)
+        if match:
+            return match.group(1)
         return None
 
 class RetrievalPipeline:
@@ -466,46 +620,10 @@ class RetrievalPipeline:
             Formatted context chunks
         """
         formatted = []
-        
+
         for result in results:
-            chunk = result.chunk
-            
-            # Basic info
-            chunk_dict = {
-                'text_content': chunk.text_content,
-                'class_level': chunk.class_level,
-                'chapter_number': chunk.chapter_number,
-                'chapter_name': chunk.chapter_name,
-                'section_name': chunk.section_name,
-                'content_type': chunk.content_type.value,
-                'score': result.score
-            }
-            
-            # Add equations
-            if chunk.latex_equations:
-                chunk_dict['equations'] = [eq.latex for eq in chunk.latex_equations]
-            
-            # Add images
-            if chunk.images:
-                chunk_dict['images'] = [
-                    {
-                        'description': img.description,
-                        'path': img.image_path,
-                        'ocr_text': img.ocr_text
-                    }
-                    for img in chunk.images
-                ]
-            
-            # Add tables
-            if chunk.tables:
-                chunk_dict['tables'] = [
-                    {
-                        'content': tbl.markdown_content,
-                        'path': tbl.table_path
-                    }
-                    for tbl in chunk.tables
-                ]
-            
+            chunk_dict = result.chunk.to_llm_context_dict()
+            chunk_dict['score'] = result.score
             formatted.append(chunk_dict)
-        
+
         return formatted
\ No newline at end of file
@@ -1,17 +1,28 @@
 
-import logging
+import math
 import pickle
+import re
+from collections import Counter
 from typing import List, Dict, Any, Tuple
 from pathlib import Path
-from rank_bm25 import BM25Okapi
 import numpy as np
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Alphanumeric token pattern, compiled once. Unlike str.split it strips
+# punctuation, so "cos," and "(cos" index as the same term as "cos".
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
 class KeywordRetriever:
-    """Keyword-based retriever using BM25."""
-    
+    """Keyword-based retriever using BM25 over sparse postings."""
+
+    # Okapi BM25 parameters (match the rank_bm25 defaults the index used before)
+    K1 = 1.5
+    B = 0.75
+    EPSILON = 0.25
+
     def __init__(self, config: Dict[str, Any]):
         """
         Initialize KeywordRetriever.
@@ -21,11 +32,13 @@ class KeywordRetriever:
         """
         self.config = config
         self.bm25_path = Path(config.get('bm25_index_path', 'data/vector_store/bm25.pkl'))
-        self.bm25 = None
+        # term -> (doc indices, precomputed per-doc score contributions)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._num_docs = 0
         self.chunk_ids = []  # Map index to chunk_id
         
         # Load existing index if available
-        if self.bm25_path.exists():
+        if self._index_paths()['meta'].exists():
             self.load_index()
 
     def index_chunks(self, chunks: List[Dict[str, Any]]):
@@ -38,12 +51,57 @@ class KeywordRetriever:
         logger.info(f"Building BM25 index for {len(chunks)} chunks...")
         
         tokenized_corpus = [self._tokenize(chunk['text_content']) for chunk in chunks]
-        self.bm25 = BM25Okapi(tokenized_corpus)
         self.chunk_ids = [chunk['chunk_id'] for chunk in chunks]
+        self._build_postings(tokenized_corpus)
         
         self.save_index()
         logger.info("BM25 index built and saved.")
 
+    def _build_postings(self, tokenized_corpus: List[List[str]]):
+        """
+        Build sparse postings with per-doc score contributions.
+
+        Each term's BM25 contribution to each document it appears in is
+        fully determined at index time (tf, doc length and idf are all
+        known), so it is precomputed here once. Query-time scoring then
+        only adds the precomputed contributions of matching documents,
+        instead of iterating the full corpus per query term.
+        """
+        self._postings = {}
+        self._num_docs = len(tokenized_corpus)
+        if not self._num_docs:
+            return
+
+        doc_len = np.array([len(doc) for doc in tokenized_corpus], dtype=np.float32)
+        avgdl = float(doc_len.mean()) or 1.0
+
+        # term -> [(doc_index, term frequency)]
+        term_freqs: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_idx, doc in enumerate(tokenized_corpus):
+            for term, tf in Counter(doc).items():
+                term_freqs.setdefault(term, []).append((doc_idx, tf))
+
+        # Okapi idf, with rank_bm25's floor for negative values
+        idf = {}
+        idf_sum = 0.0
+        negative_terms = []
+        for term, postings in term_freqs.items():
+            value = math.log(self._num_docs - len(postings) + 0.5) - math.log(len(postings) + 0.5)
+            idf[term] = value
+            idf_sum += value
+            if value < 0:
+                negative_terms.append(term)
+        eps = self.EPSILON * (idf_sum / len(idf))
+        for term in negative_terms:
+            idf[term] = eps
+
+        length_norm = self.K1 * (1 - self.B + self.B * doc_len / avgdl)
+        for term, postings in term_freqs.items():
+            doc_idx = np.array([d for d, _ in postings], dtype=np.int32)
+            tf = np.array([t for _, t in postings], dtype=np.float32)
+            contrib = idf[term] * tf * (self.K1 + 1) / (tf + length_norm[doc_idx])
+            self._postings[term] = (doc_idx, contrib.astype(np.float32))
+
     def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
         """
         Search for documents matching query keywords.
@@ -55,45 +113,107 @@ class KeywordRetriever:
         Returns:
             List of (chunk_id, score) tuples
         """
-        if not self.bm25:
+        if not self._postings:
             logger.warning("BM25 index not initialized. Returning empty results.")
             return []
             
-        tokenized_query = self._tokenize(query)
-        scores = self.bm25.get_scores(tokenized_query)
+        # Only documents containing query terms are touched
+        scores = np.zeros(self._num_docs, dtype=np.float32)
+        for term in self._tokenize(query):
+            posting = self._postings.get(term)
+            if posting is not None:
+                doc_idx, contrib = posting
+                scores[doc_idx] += contrib
         
         # Get top-k indices
         top_n = min(top_k, len(scores))
-        if top_n == 0:
+        if top_n == 0 or scores.max() <= 0:
             return []
-            
-        top_indices = np.argsort(scores)[-top_n:][::-1]
+
+        # Partial selection (O(N) + O(k log k)) instead of a full sort
+        idx = np.argpartition(scores, -top_n)[-top_n:]
+        top_indices = idx[np.argsort(scores[idx])[::-1]]
         
         results = []
         for idx in top_indices:
             score = scores[idx]
             if score > 0: # Only return relevant results
-                results.append((self.chunk_ids[idx], float(score)))
+                results.append((str(self.chunk_ids[idx]), float(score)))
                 
         return results
 
     def _tokenize(self, text: str) -> List[str]:
-        """Simple tokenizer (lowercase split)."""
-        return text.lower().split()
+        """
+        Tokenize into lowercase alphanumeric runs.
+
+        Punctuation no longer glues to tokens ("3x)" vs "3x"), which
+        improves BM25 recall on math text. Changing the tokenizer changes
+        the index vocabulary: rebuild the BM25 index after upgrading.
+        """
+        return _TOKEN_RE.findall(text.lower())
+
+    def _index_paths(self) -> Dict[str, Path]:
+        """Derive the on-disk index file paths from the configured path."""
+        base = self.bm25_path.with_suffix('')
+        return {
+            'doc_idx': base.with_name(base.name + '_doc_idx.npy'),
+            'contrib': base.with_name(base.name + '_contrib.npy'),
+            'chunk_ids': base.with_name(base.name + '_chunk_ids.npy'),
+            'meta': base.with_name(base.name + '_meta.pkl'),
+        }
 
     def save_index(self):
-        """Save BM25 index to disk."""
+        """
+        Save BM25 index to disk as mmap-friendly arrays.
+
+        Posting doc indices and contributions are concatenated into two
+        flat .npy files with per-term (start, end) offsets in a small
+        metadata pickle, so loading can memory-map the bulk data instead
+        of materializing it.
+        """
         self.bm25_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.bm25_path, 'wb') as f:
-            pickle.dump({'bm25': self.bm25, 'chunk_ids': self.chunk_ids}, f)
+        paths = self._index_paths()
+
+        offsets = {}
+        cursor = 0
+        for term, (doc_idx, _) in self._postings.items():
+            offsets[term] = (cursor, cursor + len(doc_idx))
+            cursor += len(doc_idx)
+
+        if self._postings:
+            all_doc_idx = np.concatenate([p[0] for p in self._postings.values()])
+            all_contrib = np.concatenate([p[1] for p in self._postings.values()])
+        else:
+            all_doc_idx = np.empty(0, dtype=np.int32)
+            all_contrib = np.empty(0, dtype=np.float32)
+
+        np.save(paths['doc_idx'], all_doc_idx)
+        np.save(paths['contrib'], all_contrib)
+        np.save(paths['chunk_ids'], np.asarray(self.chunk_ids))
+        with open(paths['meta'], 'wb') as f:
+            pickle.dump({'offsets': offsets, 'num_docs': self._num_docs}, f)
 
     def load_index(self):
-        """Load BM25 index from disk."""
+        """
+        Load BM25 index from disk with memory-mapped postings.
+
+        The flat posting arrays are opened with mmap_mode='r', so the OS
+        pages in only the rows touched by each query; warm-start RSS and
+        load latency stay near zero regardless of corpus size.
+        """
         try:
-            with open(self.bm25_path, 'rb') as f:
-                data = pickle.load(f)
-                self.bm25 = data['bm25']
-                self.chunk_ids = data['chunk_ids']
+            paths = self._index_paths()
+            all_doc_idx = np.load(paths['doc_idx'], mmap_mode='r')
+            all_contrib = np.load(paths['contrib'], mmap_mode='r')
+            self.chunk_ids = np.load(paths['chunk_ids'], mmap_mode='r')
+            with open(paths['meta'], 'rb') as f:
+                meta = pickle.load(f)
+            self._num_docs = meta['num_docs']
+            # Zero-copy views into the memmapped arrays
+            self._postings = {
+                term: (all_doc_idx[start:end], all_contrib[start:end])
+                for term, (start, end) in meta['offsets'].items()
+            }
             logger.info("BM25 index loaded successfully.")
         except Exception as e:
             logger.error(f"Failed to load BM25 index: {e}")
@@ -1,34 +1,202 @@
 import json
 import logging
+import os
+from collections import defaultdict
 from pathlib import Path
 
+try:
+    # orjson parses and serializes several times faster than stdlib json
+    # on large stores; optional, stdlib is the fallback
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 class MetadataStore:
+    # Fields with inverted indexes for fast filter_chunks lookups
+    INDEXED_FIELDS = (
+        'class_level', 'document_id', 'chapter_number',
+        'exercise_number', 'content_type', 'example_number'
+    )
+
     def __init__(self, storage_path: str = "data/metadata.json"):
         self.storage_path = Path(storage_path)
+        # Append-only op log replayed over the snapshot at load time, so
+        # add_chunks pays O(added) IO instead of rewriting the whole store
+        self.log_path = self.storage_path.with_suffix('.log')
         self.data = self._load()
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Build secondary indexes for O(1) entity lookups."""
+        self._by_example_number = defaultdict(list)
+        self._by_exercise_number = defaultdict(list)
+        self._by_chapter = defaultdict(list)
+        self._field_indices = {
+            field: defaultdict(set) for field in self.INDEXED_FIELDS
+        }
+        self._doc_stats = {}
+
+        for chunk_id, chunk in self.data.items():
+            self._index_chunk(chunk_id, chunk)
+
+    def _index_chunk(self, chunk_id: str, chunk: dict):
+        """Add one chunk to all secondary indexes."""
+        if chunk.get('example_number'):
+            self._by_example_number[str(chunk['example_number'])].append(chunk_id)
+        if chunk.get('exercise_number') is not None:
+            self._by_exercise_number[str(chunk['exercise_number'])].append(chunk_id)
+        self._by_chapter[
+            (chunk.get('class_level'), chunk.get('chapter_number'))
+        ].append(chunk_id)
+        for field in self.INDEXED_FIELDS:
+            value = chunk.get(field)
+            if value is not None:
+                self._field_indices[field][value].add(chunk_id)
+
+        doc_id = chunk.get('document_id', 'unknown')
+        stats = self._doc_stats.setdefault(doc_id, {
+            'document_id': doc_id,
+            'class_level': chunk.get('class_level'),
+            'total_chunks': 0,
+            'chapters': set()
+        })
+        stats['total_chunks'] += 1
+        if chunk.get('chapter_name'):
+            stats['chapters'].add(
+                f"Chapter {chunk.get('chapter_number')}: {chunk.get('chapter_name')}"
+            )
+
+    @staticmethod
+    def _dumps(obj) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj).encode('utf-8')
+
+    @staticmethod
+    def _loads(raw):
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
 
     def _load(self):
+        data = {}
         if self.storage_path.exists():
-            with open(self.storage_path, 'r') as f:
-                return json.load(f)
-        return {}
+            data = self._loads(self.storage_path.read_bytes())
+
+        # Replay the op log on top of the snapshot
+        if self.log_path.exists():
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = self._loads(line)
+                    if entry['op'] == 'add':
+                        data[entry['id']] = entry['v']
+                    elif entry['op'] == 'delete':
+                        data.pop(entry['id'], None)
+
+        return data
+
+    def _append_log(self, entries: list):
+        """Append ops to the log and fsync so they survive a crash."""
+        with open(self.log_path, 'ab') as f:
+            for entry in entries:
+                f.write(self._dumps(entry) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
 
     def save(self):
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.data, f, indent=4)
+        """Write a full snapshot and truncate the op log (compaction)."""
+        # Compact output (no indent): pretty-printing roughly doubles
+        # file size and write time on a large store
+        if orjson is not None:
+            self.storage_path.write_bytes(orjson.dumps(self.data))
+        else:
+            with open(self.storage_path, 'w') as f:
+                json.dump(self.data, f)
+        if self.log_path.exists():
+            self.log_path.unlink()
 
     def add_chunks(self, chunks: list):
-        """Add chunks to metadata store."""
+        """
+        Add chunks to metadata store.
+
+        New chunks are appended to the op log instead of rewriting the
+        full snapshot, so the IO cost scales with the batch size rather
+        than the corpus size. Call save() to compact.
+        """
+        overwriting = any(chunk.chunk_id in self.data for chunk in chunks)
+
+        entries = []
         for chunk in chunks:
-            self.data[chunk.chunk_id] = chunk.to_dict()
+            chunk_dict = chunk.to_dict()
+            self.data[chunk.chunk_id] = chunk_dict
+            entries.append({'op': 'add', 'id': chunk.chunk_id, 'v': chunk_dict})
+            if not overwriting:
+                self._index_chunk(chunk.chunk_id, chunk_dict)
+
+        if overwriting:
+            # Replacing existing entries: rebuild to avoid stale postings
+            self._build_indexes()
+
+        self._append_log(entries)
         logger.info(f"Added {len(chunks)} chunks to metadata store")
 
     def get_chunk(self, chunk_id: str) -> dict:
         """Get chunk metadata by ID."""
         return self.data.get(chunk_id)
 
+    def get_chunks_batch(self, chunk_ids: list) -> dict:
+        """
+        Get metadata for several chunks in one call.
+
+        Args:
+            chunk_ids: List of chunk IDs to fetch
+
+        Returns:
+            Dict of chunk_id -> chunk metadata (missing IDs omitted)
+        """
+        return {
+            chunk_id: self.data[chunk_id]
+            for chunk_id in chunk_ids
+            if chunk_id in self.data
+        }
+
+    def get_by_example(self, example_number) -> list:
+        """
+        Get all chunks for a specific example number.
+
+        Served from the secondary index, so entity queries like
+        "Example 13" resolve without scanning the store.
+
+        Args:
+            example_number: Example number (e.g. "13" or "5.1")
+
+        Returns:
+            List of matching chunk dicts
+        """
+        return [
+            self.data[chunk_id]
+            for chunk_id in self._by_example_number.get(str(example_number), [])
+        ]
+
+    def get_by_exercise(self, exercise_number) -> list:
+        """Get all chunks for a specific exercise number (indexed lookup)."""
+        return [
+            self.data[chunk_id]
+            for chunk_id in self._by_exercise_number.get(str(exercise_number), [])
+        ]
+
+    def get_by_chapter(self, class_level, chapter_number) -> list:
+        """Get all chunks of a chapter (indexed lookup)."""
+        return [
+            self.data[chunk_id]
+            for chunk_id in self._by_chapter.get((class_level, chapter_number), [])
+        ]
+
     def get_stats(self) -> dict:
         """Get metadata store statistics."""
         return {
@@ -46,16 +214,36 @@ class MetadataStore:
         Returns:
             List of matching chunks (dicts)
         """
-        results = []
-        for chunk in self.data.values():
-            match = True
-            for key, value in kwargs.items():
-                if chunk.get(key) != value:
-                    match = False
-                    break
-            if match:
-                results.append(chunk)
-        return results
+        # Indexed fields resolve to posting-set intersections (smallest
+        # set first); only non-indexed fields fall back to a scan
+        indexed = {
+            key: value for key, value in kwargs.items()
+            if key in self._field_indices and value is not None
+        }
+        rest = {
+            key: value for key, value in kwargs.items()
+            if key not in indexed
+        }
+
+        if indexed:
+            postings = sorted(
+                (self._field_indices[key].get(value, set())
+                 for key, value in indexed.items()),
+                key=len
+            )
+            candidate_ids = set(postings[0])
+            for posting in postings[1:]:
+                candidate_ids &= posting
+                if not candidate_ids:
+                    return []
+            candidates = (self.data[chunk_id] for chunk_id in candidate_ids)
+        else:
+            candidates = self.data.values()
+
+        return [
+            chunk for chunk in candidates
+            if all(chunk.get(key) == value for key, value in rest.items())
+        ]
 
     def list_documents(self) -> list:
         """
@@ -64,28 +252,12 @@ class MetadataStore:
         Returns:
             List of document summaries
         """
-        docs = {}
-        for chunk in self.data.values():
-            doc_id = chunk.get('document_id', 'unknown')
-            if doc_id not in docs:
-                docs[doc_id] = {
-                    'document_id': doc_id,
-                    'class_level': chunk.get('class_level'),
-                    'total_chunks': 0,
-                    'chapters': set()
-                }
-            docs[doc_id]['total_chunks'] += 1
-            if chunk.get('chapter_name'):
-                docs[doc_id]['chapters'].add(
-                    f"Chapter {chunk.get('chapter_number')}: {chunk.get('chapter_name')}"
-                )
-        
-        # Convert sets to lists and format output
-        result = []
-        for doc in docs.values():
-            doc['chapters'] = sorted(list(doc['chapters']))
-            result.append(doc)
-        return result
+        # Stats are maintained alongside the secondary indexes, so this
+        # is O(#documents) instead of a full chunk scan
+        return [
+            {**stats, 'chapters': sorted(stats['chapters'])}
+            for stats in self._doc_stats.values()
+        ]
 
     def delete_document(self, document_id: str) -> list:
         """
@@ -108,6 +280,7 @@ class MetadataStore:
         
         if deleted_ids:
             self.data = new_data
+            self._build_indexes()
             self.save()
             logger.info(f"Deleted document {document_id} ({len(deleted_ids)} chunks)")
             
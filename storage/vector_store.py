@@ -1,5 +1,6 @@
 """FAISS vector store for similarity search."""
 import faiss
+import json
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Any, Tuple, Optional
@@ -12,17 +13,29 @@ logger = get_logger(__name__)
 class FAISSVectorStore:
     """FAISS-based vector store for embeddings."""
     
-    def __init__(self, dimension: int, index_type: str = "IndexFlatIP"):
+    def __init__(
+        self,
+        dimension: int,
+        index_type: str = "IndexFlatIP",
+        nprobe: int = 16,
+        use_gpu: bool = False
+    ):
         """
         Initialize FAISS vector store.
-        
+
         Args:
             dimension: Embedding dimension
             index_type: Type of FAISS index ('IndexFlatIP' for cosine similarity)
+            nprobe: Number of inverted lists probed per query (IVFPQ only)
+            use_gpu: Offload the index to GPU 0 (batched searches benefit
+                most; requires a faiss build with GPU support)
         """
         self.dimension = dimension
         self.index_type = index_type
-        
+        self.nprobe = nprobe
+        self.use_gpu = use_gpu
+        self._gpu_resources = None
+
         # Create index
         if index_type == "IndexFlatIP":
             # Inner product for normalized vectors (cosine similarity)
@@ -30,14 +43,50 @@ class FAISSVectorStore:
         elif index_type == "IndexFlatL2":
             # L2 distance
             self.index = faiss.IndexFlatL2(dimension)
+        elif index_type == "IVFPQ":
+            # IVF-PQ: queries probe nprobe of 1024 inverted lists and
+            # compare 16-byte PQ codes instead of full float vectors,
+            # giving sub-linear search and ~16x less memory at a small
+            # recall cost. The index needs training data, so vectors are
+            # staged in a flat index until enough accumulate; small
+            # corpora simply stay on the flat fallback.
+            self._ivf_index = faiss.index_factory(
+                dimension, "IVF1024,PQ16x8", faiss.METRIC_INNER_PRODUCT
+            )
+            self._ivf_index.nprobe = nprobe
+            self._train_buffer = []
+            self.index = faiss.IndexFlatIP(dimension)
+        elif index_type == "IndexSQ8":
+            # 8-bit scalar quantization: 4x smaller vectors, so the scan
+            # moves 4x less memory at ~0.5% recall loss. Trained on the
+            # first batch of added embeddings.
+            self.index = faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
         else:
             # Default to flat IP
             self.index = faiss.IndexFlatIP(dimension)
         
         # Mapping from FAISS index to chunk_id
         self.id_map = []  # List of chunk_ids in order
-        
+        self.id_array = np.empty(0, dtype=object)  # Same mapping, for fancy indexing
+        self._id_to_idx = None  # Lazy reverse map for filtered search
+
+        if use_gpu:
+            self._to_gpu()
+
         logger.info(f"Initialized FAISS index: {index_type}, dimension: {dimension}")
+
+    def _to_gpu(self):
+        """Move the current index to GPU 0, if this faiss build allows it."""
+        if not hasattr(faiss, 'StandardGpuResources'):
+            logger.warning("faiss has no GPU support; keeping index on CPU")
+            self.use_gpu = False
+            return
+        if self._gpu_resources is None:
+            self._gpu_resources = faiss.StandardGpuResources()
+        self.index = faiss.index_cpu_to_gpu(self._gpu_resources, 0, self.index)
+        logger.info("Moved FAISS index to GPU 0")
     
     def add_embeddings(
         self,
@@ -47,28 +96,79 @@ class FAISSVectorStore:
         """
         Add embeddings to the index.
         
+        Note: following FAISS convention, the caller's array may be
+        normalized in place when it is already contiguous float32.
+
         Args:
             embeddings: Array of embeddings (n_samples, dimension)
             chunk_ids: List of chunk IDs corresponding to embeddings
         """
         if len(embeddings) != len(chunk_ids):
             raise ValueError("Number of embeddings must match number of chunk IDs")
-        
-        # Ensure embeddings are float32
-        embeddings = embeddings.astype('float32')
-        
+
+        # No-op for contiguous float32 input; astype would always copy
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
         # Normalize if using inner product
-        if self.index_type == "IndexFlatIP":
+        if self.index_type in ("IndexFlatIP", "IndexSQ8", "IVFPQ"):
             faiss.normalize_L2(embeddings)
-        
+
+        # While the IVF-PQ index is untrained, stage vectors in the flat
+        # index and keep a copy for the eventual training pass
+        if self.index_type == "IVFPQ" and self._train_buffer is not None:
+            self._train_buffer.append(embeddings.copy())
+            self.index.add(embeddings)
+            self.id_map.extend(chunk_ids)
+            self._refresh_id_array()
+            self._maybe_train_ivf()
+            logger.info(f"Added {len(embeddings)} embeddings to index. Total: {self.index.ntotal}")
+            return
+
+        # Quantized indexes need training before vectors can be added
+        if not self.index.is_trained:
+            self.index.train(embeddings)
+
         # Add to index
         self.index.add(embeddings)
         
         # Update ID mapping
         self.id_map.extend(chunk_ids)
-        
+        self._refresh_id_array()
+
         logger.info(f"Added {len(embeddings)} embeddings to index. Total: {self.index.ntotal}")
-    
+
+    def _refresh_id_array(self):
+        """Rebuild the NumPy view of id_map used for fancy indexing."""
+        self.id_array = np.array(self.id_map, dtype=object)
+        self._id_to_idx = None  # Reverse map is stale; rebuilt on demand
+
+    def _get_id_to_idx(self) -> Dict[str, int]:
+        """Lazily built reverse map of chunk_id -> internal FAISS index."""
+        if self._id_to_idx is None:
+            self._id_to_idx = {chunk_id: i for i, chunk_id in enumerate(self.id_map)}
+        return self._id_to_idx
+
+    def _maybe_train_ivf(self):
+        """
+        Swap the flat staging index for the trained IVF-PQ index once
+        enough vectors have accumulated (FAISS recommends ~39 training
+        points per inverted list).
+        """
+        total = sum(len(block) for block in self._train_buffer)
+        if total < self._ivf_index.nlist * 39:
+            return
+
+        training_data = np.vstack(self._train_buffer)
+        self._ivf_index.train(training_data)
+        self._ivf_index.add(training_data)
+        self.index = self._ivf_index
+        self._train_buffer = None
+        if self.use_gpu:
+            self._to_gpu()
+        logger.info(
+            f"Trained IVF-PQ index on {total} vectors (nprobe={self._ivf_index.nprobe})"
+        )
+
     def search(
         self,
         query_embedding: np.ndarray,
@@ -84,25 +184,55 @@ class FAISSVectorStore:
         Returns:
             List of (chunk_id, similarity_score) tuples
         """
-        # Ensure query is float32 and 2D
-        query_embedding = query_embedding.astype('float32').reshape(1, -1)
-        
-        # Normalize if using inner product
-        if self.index_type == "IndexFlatIP":
-            faiss.normalize_L2(query_embedding)
-        
-        # Search
-        scores, indices = self.index.search(query_embedding, top_k)
-        
-        # Convert to list of tuples
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx >= 0 and idx < len(self.id_map):  # Valid index
-                chunk_id = self.id_map[idx]
-                results.append((chunk_id, float(score)))
-        
-        return results
+        return self.search_batch(query_embedding, top_k)[0]
     
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Search for similar embeddings for several queries at once.
+
+        A single FAISS call over the stacked query matrix amortizes
+        per-call overhead and lets FAISS parallelize across queries.
+        Contiguous float32 input may be normalized in place.
+
+        Args:
+            query_embeddings: Query embeddings (n_queries, dimension)
+            top_k: Number of results per query
+
+        Returns:
+            One list of (chunk_id, similarity_score) tuples per query
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        if query_embeddings.ndim == 1:
+            query_embeddings = query_embeddings.reshape(1, -1)
+
+        # Normalize if using inner product
+        if self.index_type in ("IndexFlatIP", "IndexSQ8", "IVFPQ"):
+            faiss.normalize_L2(query_embeddings)
+
+        if len(self.id_array) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+
+        scores, indices = self.index.search(query_embeddings, top_k)
+
+        # Resolve chunk IDs with one fancy-indexing pass; FAISS pads
+        # short result lists with -1, which the mask drops
+        valid = (indices >= 0) & (indices < len(self.id_array))
+        resolved = self.id_array[indices.clip(0)]
+
+        batch_results = []
+        for row_ids, row_scores, row_valid in zip(resolved, scores, valid):
+            batch_results.append([
+                (chunk_id, float(score))
+                for chunk_id, score, ok in zip(row_ids, row_scores, row_valid)
+                if ok
+            ])
+
+        return batch_results
+
     def search_with_filter(
         self,
         query_embedding: np.ndarray,
@@ -120,18 +250,61 @@ class FAISSVectorStore:
         Returns:
             Filtered search results
         """
-        # Get more results initially
-        initial_k = min(top_k * 10, self.index.ntotal)
-        all_results = self.search(query_embedding, initial_k)
-        
-        # Filter results
-        filtered_results = [
-            (chunk_id, score)
-            for chunk_id, score in all_results
-            if chunk_id in filter_chunk_ids
-        ]
-        
-        return filtered_results[:top_k]
+        id_to_idx = self._get_id_to_idx()
+        int_ids = np.array(
+            [id_to_idx[cid] for cid in filter_chunk_ids if cid in id_to_idx],
+            dtype='int64'
+        )
+        if len(int_ids) == 0:
+            return []
+
+        try:
+            # Push the filter into the index scan: FAISS skips excluded
+            # vectors instead of scoring everything and post-filtering
+            selector = faiss.IDSelectorBatch(int_ids)
+            if isinstance(self.index, faiss.IndexIVF):
+                params = faiss.SearchParametersIVF(
+                    sel=selector, nprobe=self.index.nprobe
+                )
+            else:
+                params = faiss.SearchParameters(sel=selector)
+
+            query = np.ascontiguousarray(
+                query_embedding, dtype=np.float32
+            ).reshape(1, -1)
+            if self.index_type in ("IndexFlatIP", "IndexSQ8", "IVFPQ"):
+                faiss.normalize_L2(query)
+
+            scores, indices = self.index.search(
+                query, min(top_k, len(int_ids)), params=params
+            )
+            return [
+                (self.id_map[idx], float(score))
+                for score, idx in zip(scores[0], indices[0])
+                if idx >= 0
+            ]
+        except (AttributeError, RuntimeError):
+            # Selector unsupported for this index type: over-fetch sized
+            # by the filter's selectivity instead of a fixed 10x, growing
+            # geometrically if the first pass under-recalls
+            allowed = frozenset(filter_chunk_ids)
+            ntotal = self.index.ntotal
+            selectivity = min(len(allowed) / max(ntotal, 1), 1.0)
+            initial_k = min(
+                int(top_k / max(selectivity, 1e-3)) + top_k, ntotal
+            )
+            filtered_results = []
+            for _ in range(3):
+                all_results = self.search(query_embedding, initial_k)
+                filtered_results = [
+                    (chunk_id, score)
+                    for chunk_id, score in all_results
+                    if chunk_id in allowed
+                ]
+                if len(filtered_results) >= top_k or initial_k >= ntotal:
+                    break
+                initial_k = min(initial_k * 4, ntotal)
+            return filtered_results[:top_k]
     
     def save(self, save_path: Path):
         """
@@ -143,60 +316,115 @@ class FAISSVectorStore:
         save_path = Path(save_path)
         save_path.mkdir(parents=True, exist_ok=True)
         
-        # Save FAISS index
+        # Save FAISS index (GPU indexes must round-trip through CPU so
+        # the on-disk format stays loadable by CPU-only builds)
         index_file = save_path / "index.faiss"
-        faiss.write_index(self.index, str(index_file))
-        
-        # Save ID mapping
-        id_map_file = save_path / "id_map.pkl"
-        with open(id_map_file, 'wb') as f:
-            pickle.dump(self.id_map, f)
-        
-        # Save metadata
-        metadata_file = save_path / "metadata.pkl"
+        index_to_write = self.index
+        if self.use_gpu and self._gpu_resources is not None:
+            index_to_write = faiss.index_gpu_to_cpu(self.index)
+        faiss.write_index(index_to_write, str(index_file))
+        
+        # Save ID mapping and metadata as plain text/JSON: faster to
+        # parse than pickle, human-inspectable, and no unpickling of
+        # untrusted files on load
+        id_map_file = save_path / "id_map.txt"
+        id_map_file.write_text("\n".join(self.id_map), encoding='utf-8')
+
+        metadata_file = save_path / "metadata.json"
         metadata = {
             'dimension': self.dimension,
             'index_type': self.index_type,
-            'num_vectors': self.index.ntotal
+            'num_vectors': self.index.ntotal,
+            'nprobe': self.nprobe,
+            'use_gpu': self.use_gpu
         }
-        with open(metadata_file, 'wb') as f:
-            pickle.dump(metadata, f)
+        metadata_file.write_text(json.dumps(metadata, indent=2), encoding='utf-8')
+
+        # Drop stale pickle files from the old format
+        for legacy in ("id_map.pkl", "metadata.pkl"):
+            legacy_file = save_path / legacy
+            if legacy_file.exists():
+                legacy_file.unlink()
+
+        # Persist staged training vectors so an IVF-PQ store still on
+        # the flat fallback can finish training after a reload
+        buffer_file = save_path / "train_buffer.npy"
+        if self.index_type == "IVFPQ" and self._train_buffer:
+            np.save(buffer_file, np.vstack(self._train_buffer))
+        elif buffer_file.exists():
+            buffer_file.unlink()
         
         logger.info(f"Saved vector store to {save_path}")
     
     @classmethod
-    def load(cls, load_path: Path) -> 'FAISSVectorStore':
+    def load(cls, load_path: Path, mmap: bool = False) -> 'FAISSVectorStore':
         """
         Load index from disk.
-        
+
         Args:
             load_path: Path to load directory
-            
+            mmap: Memory-map the index read-only instead of loading it
+                into RAM; the OS pages in only what searches touch, so
+                startup is near-instant for large indexes
+
         Returns:
             Loaded FAISSVectorStore instance
         """
         load_path = Path(load_path)
         
-        # Load metadata
-        metadata_file = load_path / "metadata.pkl"
-        with open(metadata_file, 'rb') as f:
-            metadata = pickle.load(f)
+        # Load metadata (pickle only as legacy-format fallback)
+        metadata_file = load_path / "metadata.json"
+        if metadata_file.exists():
+            metadata = json.loads(metadata_file.read_text(encoding='utf-8'))
+        else:
+            with open(load_path / "metadata.pkl", 'rb') as f:
+                metadata = pickle.load(f)
         
         # Create instance
         store = cls(
             dimension=metadata['dimension'],
-            index_type=metadata['index_type']
+            index_type=metadata['index_type'],
+            nprobe=metadata.get('nprobe', 16)
         )
-        
+
         # Load FAISS index
         index_file = load_path / "index.faiss"
-        store.index = faiss.read_index(str(index_file))
+        if mmap:
+            try:
+                store.index = faiss.read_index(
+                    str(index_file),
+                    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                )
+            except RuntimeError as e:
+                logger.warning(f"mmap load failed ({e}); reading index into RAM")
+                store.index = faiss.read_index(str(index_file))
+        else:
+            store.index = faiss.read_index(str(index_file))
+
+        if store.index_type == "IVFPQ":
+            buffer_file = load_path / "train_buffer.npy"
+            if buffer_file.exists():
+                # Still on the flat fallback: restore the staged vectors
+                store._train_buffer = [np.load(buffer_file)]
+            else:
+                # The saved index is the trained IVF-PQ index
+                store._train_buffer = None
+                store.index.nprobe = store.nprobe
         
         # Load ID mapping
-        id_map_file = load_path / "id_map.pkl"
-        with open(id_map_file, 'rb') as f:
-            store.id_map = pickle.load(f)
-        
+        id_map_file = load_path / "id_map.txt"
+        if id_map_file.exists():
+            store.id_map = id_map_file.read_text(encoding='utf-8').splitlines()
+        else:
+            with open(load_path / "id_map.pkl", 'rb') as f:
+                store.id_map = pickle.load(f)
+        store._refresh_id_array()
+
+        # Re-offload after the CPU index has been read
+        if metadata.get('use_gpu'):
+            store.use_gpu = True
+            store._to_gpu()
+
         logger.info(f"Loaded vector store from {load_path}")
         logger.info(f"Total vectors: {store.index.ntotal}")
         
@@ -213,41 +441,69 @@ class FAISSVectorStore:
     
     def remove_by_ids(self, chunk_ids: List[str]):
         """
-        Remove vectors by chunk IDs (requires rebuilding index).
-        
+        Remove vectors by chunk IDs.
+
+        Flat-codes indexes (FlatIP/FlatL2/SQ8 and the IVF-PQ staging
+        index) delete natively in C++ with an order-preserving compaction,
+        so the positional id mapping stays valid and cost is proportional
+        to index size in native code, not N Python reconstruct calls. The
+        Python rebuild loop remains only as a fallback for index types
+        without native removal.
+
         Args:
             chunk_ids: List of chunk IDs to remove
         """
-        # Get indices to keep
-        keep_indices = [
+        to_remove = frozenset(chunk_ids)
+        remove_positions = [
             i for i, chunk_id in enumerate(self.id_map)
-            if chunk_id not in chunk_ids
+            if chunk_id in to_remove
         ]
-        
-        if len(keep_indices) == len(self.id_map):
+
+        if not remove_positions:
             logger.info("No vectors to remove")
             return
-        
-        # Rebuild index with kept vectors
-        logger.info(f"Removing {len(self.id_map) - len(keep_indices)} vectors")
-        
-        if not keep_indices:
+
+        logger.info(f"Removing {len(remove_positions)} vectors")
+
+        if len(remove_positions) == len(self.id_map):
             self.index.reset()
             self.id_map = []
+            self._refresh_id_array()
             logger.info("Removed all vectors. Index is now empty.")
             return
 
-        # Extract kept vectors
-        kept_vectors = np.array([
-            self.index.reconstruct(i) for i in keep_indices
-        ])
-        
-        # Rebuild index
-        self.index.reset()
-        self.index.add(kept_vectors.astype('float32'))
-        
+        try:
+            selector = faiss.IDSelectorBatch(
+                np.asarray(remove_positions, dtype='int64')
+            )
+            self.index.remove_ids(selector)
+        except RuntimeError:
+            # No native removal for this index type: rebuild from the
+            # surviving vectors, reconstructed in one native call rather
+            # than one Python round-trip per vector
+            removed = set(remove_positions)
+            keep_indices = np.asarray(
+                [i for i in range(len(self.id_map)) if i not in removed],
+                dtype='int64'
+            )
+            kept_vectors = np.empty(
+                (len(keep_indices), self.dimension), dtype='float32'
+            )
+            self.index.reconstruct_batch(keep_indices, kept_vectors)
+            self.index.reset()
+            self.index.add(kept_vectors)
+
         # Update ID map
-        self.id_map = [self.id_map[i] for i in keep_indices]
-        
-        logger.info(f"Rebuilt index with {self.index.ntotal} vectors")
+        self.id_map = [
+            chunk_id for chunk_id in self.id_map if chunk_id not in to_remove
+        ]
+        self._refresh_id_array()
+
+        # Staged IVF-PQ training vectors must match the surviving set
+        if self.index_type == "IVFPQ" and self._train_buffer is not None:
+            self._train_buffer = [
+                self.index.reconstruct_n(0, self.index.ntotal)
+            ]
+
+        logger.info(f"Index now holds {self.index.ntotal} vectors")
 
@@ -6,47 +6,39 @@ from utils.math_utils import MathDetector, EquationCleaner
 from utils.schema import ContentChunk, ContentType
 
 
+@pytest.fixture(scope="module")
+def detector():
+    """One MathDetector shared across the module's tests."""
+    return MathDetector()
+
+
 class TestMathDetector:
     """Test mathematical content detection."""
-    
-    def setup_method(self):
-        """Setup test fixtures."""
-        self.detector = MathDetector()
-    
-    def test_contains_math_with_latex(self):
-        """Test detection of LaTeX commands."""
-        text = "The integral \\int_0^1 x dx equals 0.5"
-        assert self.detector.contains_math(text) is True
-    
-    def test_contains_math_with_symbols(self):
-        """Test detection of math symbols."""
-        text = "The sum ∑ of numbers from 1 to n"
-        assert self.detector.contains_math(text) is True
-    
-    def test_contains_math_with_equation(self):
-        """Test detection of equations."""
-        text = "Given that x = 5 and y = 3"
-        assert self.detector.contains_math(text) is True
-    
-    def test_no_math_content(self):
-        """Test text without math."""
-        text = "This is a simple sentence without mathematics"
-        assert self.detector.contains_math(text) is False
-    
-    def test_is_proof(self):
+
+    @pytest.mark.parametrize("text,expected", [
+        ("The integral \\int_0^1 x dx equals 0.5", True),
+        ("The sum ∑ of numbers from 1 to n", True),
+        ("Given that x = 5 and y = 3", True),
+        ("This is a simple sentence without mathematics", False),
+    ])
+    def test_contains_math(self, detector, text, expected):
+        """Test math detection across LaTeX, symbols, equations and prose."""
+        assert detector.contains_math(text) is expected
+
+    def test_is_proof(self, detector):
         """Test proof detection."""
         text = "Proof: Let x be a real number. Therefore, we can conclude."
-        assert self.detector.is_proof(text) is True
-    
-    def test_is_derivation(self):
+        assert detector.is_proof(text) is True
+
+    def test_is_derivation(self, detector):
         """Test derivation detection."""
         text = "Step 1: Start with x = 5. Step 2: Add 3 to both sides."
-        assert self.detector.is_derivation(text) is True
-    
-    def test_extract_equations(self):
+        assert detector.is_derivation(text) is True
+
+    def test_extract_equations(self, detector):
         """Test equation extraction."""
         text = "The formula is $E = mc^2$ and $$F = ma$$"
-        equations = self.detector.extract_equations(text)
+        equations = detector.extract_equations(text)
         assert len(equations) == 2
         assert equations[0].is_inline is True
         assert equations[1].is_inline is False
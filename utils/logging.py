@@ -1,5 +1,6 @@
 """Logging configuration for Math RAG system."""
 
+import functools
 import logging
 import sys
 from pathlib import Path
@@ -61,7 +62,13 @@ class LoggerSetup:
     @classmethod
     def get_logger(cls, name: str):
         """Get logger instance with specific name."""
-        return logger.bind(name=name)
+        return _bound_logger(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _bound_logger(name: str):
+    """One bound logger per name (a small closed set, one per module)."""
+    return logger.bind(name=name)
 
 
 def get_logger(name: str):
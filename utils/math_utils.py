@@ -1,9 +1,31 @@
 """Mathematical content detection and processing utilities."""
 
+import functools
 import re
 from typing import List, Tuple, Dict, Optional
 from utils.schema import EquationData
 
+try:
+    import ahocorasick  # optional: multi-literal matching in one pass
+except ImportError:
+    ahocorasick = None
+
+
+def _build_latex_automaton(commands):
+    """Aho-Corasick automaton over the literal LaTeX commands, or None.
+
+    The commands are stored as escaped regex fragments; the automaton
+    wants the raw literals, so the doubled backslashes are collapsed.
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for pattern in commands:
+        word = pattern.replace('\\\\', '\\')
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
 
 class MathDetector:
     """Detect and extract mathematical content."""
@@ -29,66 +51,126 @@ class MathDetector:
     # Equation delimiters
     INLINE_DELIMITERS = [('$', '$'), (r'\(', r'\)')]
     DISPLAY_DELIMITERS = [('$$', '$$'), (r'\[', r'\]')]
-    
+
+    # Everything below is precompiled once at class creation: detection
+    # runs per chunk during ingestion, and repeated re.search with raw
+    # strings pays pattern-cache hashing on every call
+    _LATEX_RE = re.compile('|'.join(LATEX_COMMANDS))
+    # ~30 fixed literals searched simultaneously is the classic
+    # Aho-Corasick case: one O(n) pass instead of the regex alternation.
+    # None when pyahocorasick is not installed; callers fall back to
+    # _LATEX_RE
+    _LATEX_AC = _build_latex_automaton(LATEX_COMMANDS)
+    _SYMBOL_RE = re.compile('[' + ''.join(re.escape(s) for s in MATH_SYMBOLS) + ']')
+    _EQUATION_RE = re.compile(r'[a-zA-Z]\s*[=<>≤≥]\s*')
+    _FRACTION_RE = re.compile(r'\d+/\d+')
+
+    # Every positive match of the detectors above contains at least one
+    # of these characters, so one C-level character-class scan rejects
+    # plain prose (the common case) before any detector runs
+    _TRIGGER_RE = re.compile(
+        '[' + re.escape('\\$=<>/') + ''.join(re.escape(s) for s in MATH_SYMBOLS) + ']'
+    )
+
+    # One tokenizing alternation for equation extraction: a single pass
+    # in document order, with display branches before inline so a
+    # $$...$$ body is never re-matched by the $...$ branch. The (?s:)
+    # scope limits DOTALL to display equations, which may span lines
+    _EQUATION_TOKEN_RE = re.compile('|'.join(
+        ['(?s:' + re.escape(pair[0]) + '(?P<disp' + str(i) + '>.*?)'
+         + re.escape(pair[1]) + ')'
+         for i, pair in enumerate(DISPLAY_DELIMITERS)]
+        + [re.escape(pair[0]) + '(?P<inl' + str(i) + '>.*?)' + re.escape(pair[1])
+           for i, pair in enumerate(INLINE_DELIMITERS)]
+    ))
+    # Density scoring fused into one alternation with named groups:
+    # commands, symbols and all four delimiter pairs are tallied in a
+    # single traversal instead of six separate scans. Display pairs
+    # come first so $$...$$ is not consumed by the $...$ branch
+    _DENSITY_RE = re.compile(
+        '(?P<latex>' + '|'.join(LATEX_COMMANDS) + ')'
+        + '|(?P<sym>[' + ''.join(re.escape(s) for s in MATH_SYMBOLS) + '])'
+        + '|' + '|'.join(
+            re.escape(pair[0]) + '(?P<eq' + str(i) + '>.*?)' + re.escape(pair[1])
+            for i, pair in enumerate(DISPLAY_DELIMITERS + INLINE_DELIMITERS)
+        ),
+        re.DOTALL
+    )
+
+    # One alternation per indicator list: the regex engine walks the
+    # text once testing all alternatives, instead of k separate scans
+    _PROOF_RE = re.compile('|'.join((
+        r'\bproof\b', r'\bprove\b', r'\bQ\.E\.D\b', r'\b∎\b',
+        r'\btherefore\b', r'\bhence\b', r'\bthus\b',
+        r'\blet us prove\b', r'\bwe shall prove\b',
+        r'\bsolution\b', r'\bproof:\b'
+    )), re.IGNORECASE)
+    _DERIVATION_RE = re.compile('|'.join((
+        r'\bderive\b', r'\bderivation\b', r'\bderivative\b',
+        r'\bstep \d+\b', r'\bfrom.*we get\b', r'\bsubstituting\b',
+        r'\bsolving\b', r'\bsimplifying\b', r'\bon solving\b'
+    )), re.IGNORECASE)
+
+    _DEFINITION_RE = re.compile(r'\bdefinition\b|\bdefine\b|\bdef\.\b', re.IGNORECASE)
+    _THEOREM_RE = re.compile(r'\btheorem\b|\bthm\.\b|\blemma\b|\bcorollary\b', re.IGNORECASE)
+    _EXAMPLE_RE = re.compile(r'\bexample\b|\bex\.\b', re.IGNORECASE)
+    _EXERCISE_RE = re.compile(r'\bexercise\b|\bquestion\b|\bq\.\b|\bproblem\b', re.IGNORECASE)
+    _SOLUTION_RE = re.compile(r'\bsolution\b|\bsol\.\b|\banswer\b', re.IGNORECASE)
+
     def __init__(self):
         """Initialize math detector."""
-        self.latex_pattern = '|'.join(self.LATEX_COMMANDS)
-        self.symbol_pattern = '[' + ''.join(re.escape(s) for s in self.MATH_SYMBOLS) + ']'
-    
+        # Classification is pure and the same boilerplate fragments
+        # ("Solution:", exercise headers) recur across chunks and
+        # re-runs, so memoize per instance
+        self._classify_cached = functools.lru_cache(maxsize=8192)(
+            self._detect_content_type_uncached
+        )
+
     def contains_math(self, text: str) -> bool:
         """Check if text contains mathematical content."""
         if not text:
             return False
-        
+
+        # Fast pre-filter: no trigger character, no math
+        if self._TRIGGER_RE.search(text) is None:
+            return False
+
         # Check for LaTeX commands
-        if re.search(self.latex_pattern, text):
+        if self._LATEX_AC is not None:
+            if next(self._LATEX_AC.iter(text), None) is not None:
+                return True
+        elif self._LATEX_RE.search(text):
             return True
-        
+
         # Check for math symbols
-        if re.search(self.symbol_pattern, text):
+        if self._SYMBOL_RE.search(text):
             return True
-        
+
         # Check for equation patterns
-        if re.search(r'[a-zA-Z]\s*[=<>≤≥]\s*', text):
+        if self._EQUATION_RE.search(text):
             return True
-        
+
         # Check for fraction patterns
-        if re.search(r'\d+/\d+', text):
+        if self._FRACTION_RE.search(text):
             return True
-        
+
         return False
     
     def extract_equations(self, text: str) -> List[EquationData]:
-        """Extract equations from text."""
+        """Extract equations from text, in document order."""
         equations = []
-        equation_id = 0
-        
-        # Extract display equations
-        for start_delim, end_delim in self.DISPLAY_DELIMITERS:
-            pattern = re.escape(start_delim) + r'(.*?)' + re.escape(end_delim)
-            for match in re.finditer(pattern, text, re.DOTALL):
-                equation_id += 1
-                equations.append(EquationData(
-                    equation_id=f"eq_{equation_id}",
-                    latex=match.group(1).strip(),
-                    original_text=match.group(0),
-                    is_inline=False,
-                    is_multiline='\n' in match.group(1) or '\\\\' in match.group(1)
-                ))
-        
-        # Extract inline equations
-        for start_delim, end_delim in self.INLINE_DELIMITERS:
-            pattern = re.escape(start_delim) + r'(.*?)' + re.escape(end_delim)
-            for match in re.finditer(pattern, text):
-                equation_id += 1
-                equations.append(EquationData(
-                    equation_id=f"eq_{equation_id}",
-                    latex=match.group(1).strip(),
-                    original_text=match.group(0),
-                    is_inline=True,
-                    is_multiline=False
-                ))
-        
+
+        for match in self._EQUATION_TOKEN_RE.finditer(text):
+            body = match.group(match.lastgroup)
+            is_inline = match.lastgroup.startswith('inl')
+            equations.append(EquationData(
+                equation_id=f"eq_{len(equations) + 1}",
+                latex=body.strip(),
+                original_text=match.group(0),
+                is_inline=is_inline,
+                is_multiline=not is_inline and ('\n' in body or '\\\\' in body)
+            ))
+
         return equations
     
     def calculate_math_density(self, text: str) -> float:
@@ -98,72 +180,51 @@ class MathDetector:
         
         math_chars = 0
         total_chars = len(text)
-        
-        # Count LaTeX commands
-        math_chars += len(re.findall(self.latex_pattern, text)) * 5
-        
-        # Count math symbols
-        math_chars += len(re.findall(self.symbol_pattern, text)) * 2
-        
-        # Count equations
-        for start_delim, end_delim in self.DISPLAY_DELIMITERS + self.INLINE_DELIMITERS:
-            pattern = re.escape(start_delim) + r'(.*?)' + re.escape(end_delim)
-            for match in re.finditer(pattern, text, re.DOTALL):
-                math_chars += len(match.group(1))
-        
+
+        # Single pass: LaTeX commands weigh 5, symbols 2, delimited
+        # equations their body length
+        for match in self._DENSITY_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == 'latex':
+                math_chars += 5
+            elif kind == 'sym':
+                math_chars += 2
+            else:
+                math_chars += len(match.group(kind))
+
         return min(math_chars / total_chars, 1.0) if total_chars > 0 else 0.0
     
     def is_proof(self, text: str) -> bool:
         """Check if text is a proof."""
-        proof_indicators = [
-            r'\bproof\b', r'\bprove\b', r'\bQ\.E\.D\b', r'\b∎\b',
-            r'\btherefore\b', r'\bhence\b', r'\bthus\b',
-            r'\blet us prove\b', r'\bwe shall prove\b',
-            r'\bsolution\b', r'\bproof:\b'
-        ]
-        
-        text_lower = text.lower()
-        for indicator in proof_indicators:
-            if re.search(indicator, text_lower, re.IGNORECASE):
-                return True
-        return False
-    
+        return self._PROOF_RE.search(text) is not None
+
     def is_derivation(self, text: str) -> bool:
         """Check if text is a derivation."""
-        derivation_indicators = [
-            r'\bderive\b', r'\bderivation\b', r'\bderivative\b',
-            r'\bstep \d+\b', r'\bfrom.*we get\b', r'\bsubstituting\b',
-            r'\bsolving\b', r'\bsimplifying\b', r'\bon solving\b'
-        ]
-        
-        text_lower = text.lower()
-        for indicator in derivation_indicators:
-            if re.search(indicator, text_lower, re.IGNORECASE):
-                return True
-        
-        # Check for multi-step equations
-        if text.count('=') >= 3:
+        if self._DERIVATION_RE.search(text):
             return True
-        
-        return False
-    
+
+        # Check for multi-step equations
+        return text.count('=') >= 3
+
     def detect_content_type(self, text: str) -> str:
         """Detect the type of mathematical content."""
-        text_lower = text.lower()
-        
-        if re.search(r'\bdefinition\b|\bdefine\b|\bdef\.\b', text_lower):
+        return self._classify_cached(text)
+
+    def _detect_content_type_uncached(self, text: str) -> str:
+        """Uncached classification body behind the LRU."""
+        if self._DEFINITION_RE.search(text):
             return 'definition'
-        elif re.search(r'\btheorem\b|\bthm\.\b|\blemma\b|\bcorollary\b', text_lower):
+        elif self._THEOREM_RE.search(text):
             return 'theorem'
         elif self.is_proof(text):
             return 'proof'
         elif self.is_derivation(text):
             return 'derivation'
-        elif re.search(r'\bexample\b|\bex\.\b', text_lower):
+        elif self._EXAMPLE_RE.search(text):
             return 'example'
-        elif re.search(r'\bexercise\b|\bquestion\b|\bq\.\b|\bproblem\b', text_lower):
+        elif self._EXERCISE_RE.search(text):
             return 'exercise'
-        elif re.search(r'\bsolution\b|\bsol\.\b|\banswer\b', text_lower):
+        elif self._SOLUTION_RE.search(text):
             return 'solution'
         else:
             return 'text'
@@ -171,34 +232,37 @@ class MathDetector:
 
 class EquationCleaner:
     """Clean and normalize mathematical equations."""
-    
+
+    # Common OCR symbol -> LaTeX command fixes, applied in one fused
+    # pass instead of a chain of str.replace calls (each of which is a
+    # full scan plus a new string)
+    _REPLACEMENTS = {
+        'α': r'\alpha',
+        'β': r'\beta',
+        'γ': r'\gamma',
+        'θ': r'\theta',
+        '∫': r'\int',
+        '∑': r'\sum',
+        '√': r'\sqrt',
+        '∞': r'\infty',
+        '≤': r'\leq',
+        '≥': r'\geq',
+        '≠': r'\neq',
+        '≈': r'\approx',
+    }
+    _REPLACEMENT_RE = re.compile('|'.join(re.escape(s) for s in _REPLACEMENTS))
+    _WHITESPACE_RE = re.compile(r'\s+')
+
     @staticmethod
     def clean_latex(latex: str) -> str:
         """Clean LaTeX equation string."""
         # Remove extra whitespace
-        latex = re.sub(r'\s+', ' ', latex).strip()
-        
-        # Fix common OCR errors
-        replacements = {
-            'x': '×',  # multiplication
-            'α': r'\alpha',
-            'β': r'\beta',
-            'γ': r'\gamma',
-            'θ': r'\theta',
-            '∫': r'\int',
-            '∑': r'\sum',
-            '√': r'\sqrt',
-            '∞': r'\infty',
-            '≤': r'\leq',
-            '≥': r'\geq',
-            '≠': r'\neq',
-            '≈': r'\approx',
-        }
-        
-        for symbol, latex_cmd in replacements.items():
-            latex = latex.replace(symbol, latex_cmd)
-        
-        return latex
+        latex = EquationCleaner._WHITESPACE_RE.sub(' ', latex).strip()
+
+        # Fix common OCR errors in a single substitution pass
+        return EquationCleaner._REPLACEMENT_RE.sub(
+            lambda m: EquationCleaner._REPLACEMENTS[m.group(0)], latex
+        )
     
     @staticmethod
     def extract_formula_name(text: str) -> Optional[str]:
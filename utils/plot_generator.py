@@ -1,80 +1,157 @@
 
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-import numpy as np
-import io
-import uuid
+import functools
+import hashlib
+import multiprocessing
 from pathlib import Path
 from utils.logging import get_logger
 from config import get_config
 
 logger = get_logger(__name__)
 
+
+@functools.lru_cache(maxsize=256)
+def _compile_plot(code: str):
+    """Compile plot code once per distinct source string.
+
+    Templated snippets (same structure, different data) recur across
+    queries; caching the code object skips the parse/compile step on
+    repeats. Lives in the worker process, where exec happens.
+    """
+    return compile(code, '<plot>', 'exec')
+
+
+def _plot_worker(task_queue, result_queue):
+    """
+    Consumer loop for the persistent plot worker process.
+
+    matplotlib/seaborn/pandas/numpy are imported once here, so the main
+    process never pays their import cost or blocks on rendering, and a
+    crashing or runaway plot script cannot take the service down.
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    import pandas as pd
+    import numpy as np
+
+    sns.set_theme(style="whitegrid")
+
+    # Built once for the worker's lifetime: exec injects __builtins__
+    # itself (which already covers str/int/len/...), and top-level names
+    # assigned by plot code land in the per-task locals dict, not here
+    global_scope = {
+        'plt': plt,
+        'sns': sns,
+        'pd': pd,
+        'np': np,
+    }
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        code, filepath, dpi = task
+
+        try:
+            # The previous task's finally block closed all figures, so
+            # any figure present after exec was created by this code
+            # (plt.clf() would itself spawn an empty figure via gcf())
+            exec(_compile_plot(code), global_scope, {})
+
+            # Save the figure. tight_layout() computes bounds
+            # analytically, unlike bbox_inches='tight' which renders the
+            # figure an extra time just to measure it
+            if plt.get_fignums():
+                fig = plt.gcf()
+                fig.tight_layout()
+                fig.savefig(filepath, dpi=dpi)
+                result_queue.put(('ok', filepath))
+            else:
+                result_queue.put(('no_figure', None))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+        finally:
+            plt.close('all')  # Cleanup
+
+
 class PlotGenerator:
     """Securely executes plotting code and returns the image path."""
-    
-    def __init__(self, output_dir: Path):
+
+    def __init__(self, output_dir: Path, dpi: int = None):
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        # Verify seaborn style
-        sns.set_theme(style="whitegrid")
+        # PNG encode time scales with dpi²; 100 is plenty for chat-sized
+        # charts and halves the pixel count vs the old hardcoded 150
+        if dpi is None:
+            dpi = int(get_config().yaml_config.get('plotting', {}).get('dpi', 100))
+        self.dpi = dpi
+        # Worker process is spawned lazily on first use
+        self._worker = None
+        self._tasks = None
+        self._results = None
+
+    def _ensure_worker(self):
+        """Start (or restart) the persistent plot worker process."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._worker = multiprocessing.Process(
+            target=_plot_worker,
+            args=(self._tasks, self._results),
+            daemon=True
+        )
+        self._worker.start()
+        logger.info(f"Started plot worker process (pid={self._worker.pid})")
+
+    def _shutdown_worker(self):
+        """Tear down a wedged or dead worker so the next call respawns it."""
+        if self._worker is not None and self._worker.is_alive():
+            self._worker.terminate()
+        self._worker = None
 
     def execute_plot_code(self, code: str) -> str:
         """
         Executes the provided Python code to generate a plot.
-        
+
+        The code runs in a persistent worker process with matplotlib
+        pre-imported, isolating the main process from crashes, leaks
+        and blocking renders.
+
         Args:
             code: Python code string (should use plt or sns)
-            
+
         Returns:
             Absolute path to the generated image file.
-            
+
         Raises:
             ValueError: If code execution fails or no plot is generated.
         """
-        # Create a unique filename
-        filename = f"plot_{uuid.uuid4().hex}.png"
-        filepath = self.output_dir / filename
-        
-        # Prepare execution environment
-        # We strictly limit globals to safe plotting libraries
-        local_scope = {}
-        global_scope = {
-            'plt': plt,
-            'sns': sns,
-            'pd': pd,
-            'np': np,
-            'str': str,
-            'int': int,
-            'float': float,
-            'list': list,
-            'dict': dict,
-            'range': range,
-            'len': len
-            # Add other safe builtins as needed
-        }
-        
+        # Name the file after a content hash of the code: re-running the
+        # same plot (repeated queries, test re-runs) becomes a cache hit
+        # that skips the whole render pipeline
+        digest = hashlib.blake2b(code.encode(), digest_size=12).hexdigest()
+        filepath = self.output_dir / f"plot_{digest}.png"
+        if filepath.exists():
+            logger.info(f"Reusing cached plot: {filepath}")
+            return str(filepath)
+
         try:
-            # Clear any existing plots
-            plt.clf()
-            
-            # Execute the code
-            exec(code, global_scope, local_scope)
-            
-            # Save the figure
-            if plt.get_fignums():
-                plt.savefig(str(filepath), bbox_inches='tight', dpi=150)
-                plt.close('all')
-                logger.info(f"Plot generated successfully: {filepath}")
-                return str(filepath)
-            else:
-                logger.warning("Code executed but no figure was created.")
-                return None
-                
+            self._ensure_worker()
+            self._tasks.put((code, str(filepath), self.dpi))
+            status, payload = self._results.get(timeout=30)
         except Exception as e:
-            logger.error(f"Error executing plot code: {e}")
-            plt.close('all') # Cleanup
+            logger.error(f"Plot worker failed: {e}")
+            self._shutdown_worker()
             return None
+
+        if status == 'ok':
+            logger.info(f"Plot generated successfully: {payload}")
+            return payload
+        if status == 'error':
+            logger.error(f"Error executing plot code: {payload}")
+            return None
+
+        logger.warning("Code executed but no figure was created.")
+        return None
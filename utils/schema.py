@@ -1,7 +1,7 @@
 """Data schemas for Math RAG system."""
 
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass, field, fields
+from typing import List, NamedTuple, Optional, Dict, Any
 from enum import Enum
 from datetime import datetime
 
@@ -31,7 +31,13 @@ class ImageType(Enum):
     MIXED = "mixed"
 
 
-@dataclass
+# Plain dict lookups skip the Enum.__call__ machinery on the
+# deserialization hot path
+_CONTENT_TYPE_BY_VALUE = {m.value: m for m in ContentType}
+_IMAGE_TYPE_BY_VALUE = {m.value: m for m in ImageType}
+
+
+@dataclass(slots=True)
 class ImageData:
     """Image metadata and information."""
     image_id: str
@@ -45,12 +51,20 @@ class ImageData:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
-        data = asdict(self)
-        data['image_type'] = self.image_type.value
-        return data
+        # Explicit literal: direct attribute loads, no introspection
+        return {
+            'image_id': self.image_id,
+            'image_path': self.image_path,
+            'image_type': self.image_type.value,
+            'description': self.description,
+            'contains_text': self.contains_text,
+            'ocr_text': self.ocr_text,
+            'page_number': self.page_number,
+            'bbox': list(self.bbox) if self.bbox is not None else None,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class TableData:
     """Table metadata and content."""
     table_id: str
@@ -66,10 +80,21 @@ class TableData:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
-        return asdict(self)
+        return {
+            'table_id': self.table_id,
+            'table_path': self.table_path,
+            'markdown_content': self.markdown_content,
+            'csv_content': self.csv_content,
+            'num_rows': self.num_rows,
+            'num_cols': self.num_cols,
+            'has_header': self.has_header,
+            'contains_math': self.contains_math,
+            'page_number': self.page_number,
+            'bbox': list(self.bbox) if self.bbox is not None else None,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class EquationData:
     """Mathematical equation data."""
     equation_id: str
@@ -80,10 +105,16 @@ class EquationData:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
-        return asdict(self)
+        return {
+            'equation_id': self.equation_id,
+            'latex': self.latex,
+            'original_text': self.original_text,
+            'is_inline': self.is_inline,
+            'is_multiline': self.is_multiline,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ContentChunk:
     """Main content chunk with comprehensive metadata."""
     
@@ -127,7 +158,6 @@ class ContentChunk:
     exercise_number: Optional[int] = None
     question_number: Optional[str] = None
     is_exercise: bool = False
-    is_exercise: bool = False
     is_solution: bool = False
     
     # Example Specific
@@ -146,24 +176,94 @@ class ContentChunk:
     complexity_score: float = 0.0
     tags: List[str] = field(default_factory=list)
     
-    # Timestamps
-    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
-    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    # Timestamps; stamped by new() for freshly authored chunks, carried
+    # through from the stored data on deserialization
+    created_at: str = ""
+    updated_at: str = ""
+
+    # Memoized get_full_context result; chunks are read-only after
+    # indexing, so no invalidation is needed
+    _full_context: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert chunk to dictionary for storage."""
-        data = asdict(self)
+        # Built field-by-field rather than via asdict: asdict deep-copies
+        # every value and converts the nested dataclasses a first time,
+        # only for the list fields to be converted again below
+        data = {name: getattr(self, name) for name in self._FIELD_NAMES}
         data['content_type'] = self.content_type.value
-        data['latex_equations'] = [eq.to_dict() for eq in self.latex_equations]
-        data['images'] = [img.to_dict() for img in self.images]
-        data['tables'] = [tbl.to_dict() for tbl in self.tables]
+        data['page_numbers'] = list(self.page_numbers)
+        data['tags'] = list(self.tags)
+        data['latex_equations'] = [
+            eq.to_dict() if isinstance(eq, EquationData) else eq
+            for eq in self.latex_equations
+        ]
+        data['images'] = [
+            img.to_dict() if isinstance(img, ImageData) else img
+            for img in self.images
+        ]
+        data['tables'] = [
+            tbl.to_dict() if isinstance(tbl, TableData) else tbl
+            for tbl in self.tables
+        ]
         return data
     
+    def to_llm_context_dict(self) -> Dict[str, Any]:
+        """Minimal projection for LLM context.
+
+        Only the fields the prompt formatter actually uses, so callers
+        never pay full to_dict serialization per retrieved result.
+        """
+        data = {
+            'text_content': self.text_content,
+            'class_level': self.class_level,
+            'chapter_number': self.chapter_number,
+            'chapter_name': self.chapter_name,
+            'section_name': self.section_name,
+            'content_type': self.content_type.value,
+        }
+
+        if self.latex_equations:
+            data['equations'] = [eq.latex for eq in self.latex_equations]
+
+        if self.images:
+            data['images'] = [
+                {
+                    'description': img.description,
+                    'path': img.image_path,
+                    'ocr_text': img.ocr_text
+                }
+                for img in self.images
+            ]
+
+        if self.tables:
+            data['tables'] = [
+                {
+                    'content': tbl.markdown_content,
+                    'path': tbl.table_path
+                }
+                for tbl in self.tables
+            ]
+
+        return data
+
+    @classmethod
+    def new(cls, **kwargs) -> 'ContentChunk':
+        """Create a freshly authored chunk with timestamps stamped.
+
+        Kept out of the field defaults so that deserializing thousands
+        of stored chunks does not call datetime.now() twice per chunk.
+        """
+        now = datetime.now().isoformat()
+        kwargs.setdefault('created_at', now)
+        kwargs.setdefault('updated_at', now)
+        return cls(**kwargs)
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ContentChunk':
         """Create chunk from dictionary."""
         # Convert enums and nested objects
-        data['content_type'] = ContentType(data['content_type'])
+        data['content_type'] = _CONTENT_TYPE_BY_VALUE[data['content_type']]
         
         if 'latex_equations' in data:
             data['latex_equations'] = [
@@ -173,7 +273,7 @@ class ContentChunk:
         
         if 'images' in data:
             data['images'] = [
-                ImageData(**{**img, 'image_type': ImageType(img['image_type'])}) 
+                ImageData(**{**img, 'image_type': _IMAGE_TYPE_BY_VALUE[img['image_type']]}) 
                 if isinstance(img, dict) else img
                 for img in data['images']
             ]
@@ -185,49 +285,121 @@ class ContentChunk:
             ]
         
         return cls(**data)
-    
+
+    @classmethod
+    def from_dict_lazy(cls, data: Dict[str, Any]) -> 'ContentChunk':
+        """
+        Create chunk from dictionary, deferring nested-object decode.
+
+        Scalar fields are populated immediately; latex_equations, images
+        and tables stay as raw dicts until first accessed. Retrieval
+        hydrates chunks per query, and consumers that only read the text
+        and location fields never pay for constructing the nested
+        EquationData/ImageData/TableData objects.
+        """
+        data = dict(data)
+        data['content_type'] = _CONTENT_TYPE_BY_VALUE[data['content_type']]
+        return _LazyContentChunk(**data)
+
     def get_full_context(self) -> str:
-        """Get full text context including all content."""
-        context_parts = []
-        
-        # Add location context
-        context_parts.append(f"Class {self.class_level} | Chapter {self.chapter_number}: {self.chapter_name}")
+        """Get full text context including all content.
+
+        The result is computed once per chunk; reranking, prompt
+        construction and logging all call this for the same instance.
+        """
+        if self._full_context is not None:
+            return self._full_context
+
+        # Header built as one string: the common text-only chunk never
+        # touches a parts list at all
+        header = f"Class {self.class_level} | Chapter {self.chapter_number}: {self.chapter_name}"
         if self.section_name:
-            context_parts.append(f"Section: {self.section_name}")
-        
-        # Add content type
-        context_parts.append(f"Content Type: {self.content_type.value.upper()}")
-        
-        # Add main text
-        context_parts.append(f"\n{self.text_content}")
-        
+            header += f"\nSection: {self.section_name}"
+        header += f"\nContent Type: {self.content_type.value.upper()}\n\n{self.text_content}"
+
+        if not (self.latex_equations or self.tables or self.images):
+            self._full_context = header
+            return header
+
+        context_parts = [header]
+
         # Add equations
         if self.latex_equations:
             context_parts.append("\nEquations:")
-            for eq in self.latex_equations:
-                context_parts.append(f"  {eq.latex}")
-        
+            context_parts.append("\n".join(f"  {eq.latex}" for eq in self.latex_equations))
+
         # Add table references
         if self.tables:
             context_parts.append(f"\n[Contains {len(self.tables)} table(s)]")
-        
+
         # Add image references
         if self.images:
             context_parts.append(f"\n[Contains {len(self.images)} image(s)]")
             for img in self.images:
                 if img.description:
                     context_parts.append(f"  - {img.description}")
-        
-        return "\n".join(context_parts)
+
+        self._full_context = "\n".join(context_parts)
+        return self._full_context
 
 
-@dataclass
-class RetrievalResult:
-    """Result from retrieval system."""
+# Field names cached once: fields() re-introspects the dataclass
+# machinery on every call. Underscored fields are internal caches, not
+# part of the stored schema
+ContentChunk._FIELD_NAMES = tuple(
+    f.name for f in fields(ContentChunk) if not f.name.startswith('_')
+)
+
+
+def _lazy_list_property(name: str, decoder) -> property:
+    """Property that decodes a list of raw dicts on first access."""
+    private = '_' + name
+
+    def getter(self):
+        value = getattr(self, private)
+        if value and isinstance(value[0], dict):
+            value = [decoder(item) for item in value]
+            setattr(self, private, value)
+        return value
+
+    def setter(self, value):
+        setattr(self, private, value)
+
+    return property(getter, setter)
+
+
+class _LazyContentChunk(ContentChunk):
+    """ContentChunk whose nested objects decode on first access."""
+
+    # Backing slots for the lazy properties below; declaring them keeps
+    # lazy chunks __dict__-free like their slotted parent
+    __slots__ = ('_latex_equations', '_images', '_tables')
+
+    latex_equations = _lazy_list_property(
+        'latex_equations',
+        lambda eq: EquationData(**eq)
+    )
+    images = _lazy_list_property(
+        'images',
+        lambda img: ImageData(**{**img, 'image_type': _IMAGE_TYPE_BY_VALUE[img['image_type']]})
+    )
+    tables = _lazy_list_property(
+        'tables',
+        lambda tbl: TableData(**tbl)
+    )
+
+
+class RetrievalResult(NamedTuple):
+    """Result from retrieval system.
+
+    A NamedTuple rather than a dataclass: one of these is allocated per
+    hit per query, and tuple construction goes through the C-level
+    __new__ with a smaller footprint than a slotted instance.
+    """
     chunk: ContentChunk
     score: float
     rank: int
-    
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
         return {